@@ -1,10 +1,11 @@
+import fnmatch
 import json
+import re
 import shutil
 from pathlib import Path
 import os
 import subprocess
-from typing import Any, Dict, Union
-from fnmatch import fnmatch
+from typing import Any, Callable, Dict, Union
 
 EXCLUDE_LIKE: Dict[str, list[str]] = {
     'numpy': ['*.tests.*'],
@@ -56,11 +57,9 @@ def activate_and_uninstall_package(venv_name: str, package: str) -> None:
 
 
 def create_py_typed_file(py_typed_path: str) -> None:
-    if not os.path.exists(os.path.dirname(py_typed_path)):
-        os.makedirs(os.path.dirname(py_typed_path))
-    if not os.path.exists(py_typed_path):
-        with open(py_typed_path, "w"):
-            pass
+    path = Path(py_typed_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch(exist_ok=True)
 
 
 def run_pyright(venv_name: str, package: str, output_file: str) -> None:
@@ -82,9 +81,19 @@ def run_pyright(venv_name: str, package: str, output_file: str) -> None:
         print(f"Output: {e.output}")
 
 
+def _compile_exclude_like(exclude_like: list[str]) -> Callable[[str], re.Match[str] | None]:
+    # One regex for all patterns, so each symbol name is checked with a single
+    # match instead of an fnmatch() call per pattern. fnmatch() case-folds via
+    # os.path.normcase, so do the same where that folds case (Windows).
+    flags = re.IGNORECASE if os.path.normcase("A") != "A" else 0
+    combined = "|".join(fnmatch.translate(pattern) for pattern in exclude_like)
+    return re.compile(combined or "(?!)", flags).match
+
+
 def parse_output_json(output_file: str, exclude_like: list[str] | None = None) -> Dict[str, Union[int, float]]:
     try:
-        with open(output_file, "r") as f:
+        # Binary read: json detects UTF-8 itself, skipping the text layer.
+        with open(output_file, "rb") as f:
             output_data = json.load(f)
             pyright_data: Dict[str, Union[int, float]] = {}
 
@@ -92,18 +101,21 @@ def parse_output_json(output_file: str, exclude_like: list[str] | None = None) -
             if exclude_like is None:
                 coverage: float = output_data["typeCompleteness"]["completenessScore"] * 100.0
             else:
-                matched_symbols = [
-                    x for x in output_data["typeCompleteness"]["symbols"]
-                    if x['isExported']
+                excluded = _compile_exclude_like(exclude_like)
+                # Count matching symbols and known types in one pass rather
+                # than building a filtered list and summing over it again.
+                matched = 0
+                known = 0
+                for x in output_data["typeCompleteness"]["symbols"]:
+                    if not x['isExported']:
+                        continue
                     # Keep symbols where there's any name which doesn't match any excluded patterns.
-                    and any(
-                        all(not fnmatch(name, pattern) for pattern in exclude_like)
-                        for name in [x['name'], *x.get('alternateNames', [])]
-                    )
-                ]
-                coverage = (
-                    sum(x["isTypeKnown"] for x in matched_symbols) / len(matched_symbols) * 100
-                )
+                    if not excluded(x['name']) or any(
+                        not excluded(name) for name in x.get('alternateNames', ())
+                    ):
+                        matched += 1
+                        known += x["isTypeKnown"]
+                coverage = known / matched * 100
             
             pyright_data = symbol_count
             pyright_data["coverage"] = coverage
@@ -172,12 +184,7 @@ def main(packages: list[dict[str, Any]]) -> Dict[str, Any]:
         print(f"Exported Pyright Symbol Counts: {stats[package]}")
         print()
 
-        cleanup_cmd = (
-            f"rm -rf {venv_name}"
-            if os.name == "posix"
-            else f"deactivate && rmdir /s /q {venv_name}"
-        )
-        subprocess.run(cleanup_cmd, shell=True, check=True)
+        shutil.rmtree(venv_name, ignore_errors=True)
 
     return stats
 
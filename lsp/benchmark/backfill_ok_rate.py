@@ -66,6 +66,10 @@ def backfill_file(file_path: Path) -> bool:
 
         # Check if any aggregate stats already have ok_rate
         aggregate = data.get("aggregate", {})
+        if not aggregate:
+            print(f"  ✓ {file_path.name}: No aggregate stats, skipping")
+            return False
+
         has_ok_rate = any("ok_rate" in stats for stats in aggregate.values())
 
         if has_ok_rate:
@@ -76,6 +80,10 @@ def backfill_file(file_path: Path) -> bool:
         type_checkers = data.get("type_checkers", [])
         results = data.get("results", [])
 
+        if not type_checkers or not results:
+            print(f"  ✓ {file_path.name}: No type checkers or results, skipping")
+            return False
+
         ok_rates = calculate_ok_rate_from_results(results, type_checkers)
 
         # Update aggregate stats with ok_rate
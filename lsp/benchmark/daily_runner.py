@@ -11,7 +11,11 @@ This script:
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
+import contextlib
+import functools
 import json
+import os
 import subprocess
 import shutil
 import sys
@@ -24,6 +28,8 @@ from typing import Any, Callable, TypedDict
 ROOT_DIR = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(ROOT_DIR))
 
+from lsp import lsp_benchmark as _lsp_benchmark
+
 
 def get_type_checker_versions() -> dict[str, str]:
     """Get version strings for all type checkers.
@@ -143,40 +149,6 @@ class PackageInfo(TypedDict):
     ranking: int
 
 
-# Type for the benchmark runner function
-BenchmarkRunner = Callable[[list[str]], int]
-
-# Lazy-loaded benchmark runner
-_benchmark_runner: BenchmarkRunner | None = None
-
-
-def get_benchmark_runner() -> BenchmarkRunner:
-    """Get the benchmark runner function, loading it lazily."""
-    global _benchmark_runner
-    if _benchmark_runner is not None:
-        return _benchmark_runner
-
-    import importlib.util
-
-    benchmark_path = ROOT_DIR / "lsp" / "lsp_benchmark.py"
-
-    if not benchmark_path.exists():
-        raise ImportError(f"Benchmark module not found at {benchmark_path}")
-
-    spec = importlib.util.spec_from_file_location("lsp_benchmark", benchmark_path)
-    if spec is None or spec.loader is None:
-        raise ImportError(f"Could not load {benchmark_path}")
-
-    module = importlib.util.module_from_spec(spec)
-    # Register the module in sys.modules BEFORE exec_module
-    # This is required for dataclasses to work properly
-    sys.modules["lsp_benchmark"] = module
-    spec.loader.exec_module(module)
-    runner: BenchmarkRunner = module.main
-    _benchmark_runner = runner
-    return runner
-
-
 # Type checker LSP commands
 TYPE_CHECKER_COMMANDS: dict[str, str] = {
     "pyright": "pyright-langserver --stdio",
@@ -187,6 +159,13 @@ TYPE_CHECKER_COMMANDS: dict[str, str] = {
 
 DEFAULT_TYPE_CHECKERS: list[str] = ["pyright", "pyrefly", "ty", "zuban"]
 
+# Abort clones that stall below GIT_HTTP_LOW_SPEED_LIMIT bytes/s for
+# GIT_HTTP_LOW_SPEED_TIME seconds instead of waiting for the full timeout.
+GIT_CLONE_ENV: dict[str, str] = {
+    "GIT_HTTP_LOW_SPEED_LIMIT": "1000",
+    "GIT_HTTP_LOW_SPEED_TIME": "30",
+}
+
 
 def load_packages_from_install_envs(
     limit: int | None = None,
@@ -241,6 +220,11 @@ def load_packages_from_install_envs(
             }
         )
 
+        # The file is already in ranking order, so without a name filter
+        # (which needs the full scan for its warnings) stop at the limit.
+        if limit and not name_filter and len(packages) >= limit:
+            break
+
     if name_filter:
         found = {p["name"].lower() for p in packages}
         for n in package_names or []:
@@ -260,6 +244,7 @@ def fetch_github_package(
     package_name: str,
     temp_dir: Path,
     timeout: int = 180,
+    log: Callable[[str], None] = print,
 ) -> Path | None:
     """Clone a GitHub repository for benchmarking.
 
@@ -268,6 +253,7 @@ def fetch_github_package(
         package_name: Name to use for the cloned directory.
         temp_dir: Directory to clone into.
         timeout: Timeout in seconds for the clone operation.
+        log: Receives progress and error messages.
 
     Returns:
         Path to the cloned repository, or None on failure.
@@ -275,13 +261,19 @@ def fetch_github_package(
     target_path = temp_dir / package_name
 
     try:
-        print(f"  Cloning {github_url}...")
+        log(f"  Cloning {github_url}...")
+        # Partial clone: only the blobs needed for the HEAD checkout are
+        # fetched. Servers without filter support ignore --filter and fall
+        # back to a regular shallow clone.
         result = subprocess.run(
             [
                 "git",
                 "clone",
+                "--filter=blob:none",
                 "--depth",
                 "1",
+                "--single-branch",
+                "--no-tags",
                 "--quiet",
                 github_url,
                 str(target_path),
@@ -289,24 +281,107 @@ def fetch_github_package(
             capture_output=True,
             text=True,
             timeout=timeout,
+            env={**os.environ, **GIT_CLONE_ENV},
         )
 
         if result.returncode != 0:
-            print(f"  Failed to clone: {result.stderr}")
+            log(f"  Failed to clone: {result.stderr}")
             return None
 
         return target_path
     except subprocess.TimeoutExpired:
-        print(f"  Timeout cloning {github_url}")
+        log(f"  Timeout cloning {github_url}")
         return None
     except Exception as e:
-        print(f"  Error cloning {github_url}: {e}")
+        log(f"  Error cloning {github_url}: {e}")
         return None
 
 
+def _run_git(args: list[str], timeout: int, cwd: Path | None = None) -> str:
+    """Run a git command and return its stripped stdout.
+
+    Raises:
+        RuntimeError: If git exits with a non-zero status.
+    """
+    result = subprocess.run(
+        ["git", *args],
+        cwd=str(cwd) if cwd else None,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        env={**os.environ, **GIT_CLONE_ENV},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return result.stdout.strip()
+
+
+def get_or_update_repo(
+    github_url: str,
+    package_name: str,
+    cache_dir: Path,
+    timeout: int = 180,
+    log: Callable[[str], None] = print,
+) -> Path | None:
+    """Return a checkout of the repository's HEAD from a persistent cache.
+
+    On a cache miss the repository is cloned into ``cache_dir``. On a hit the
+    remote HEAD is compared with the cached checkout and only fetched when it
+    has moved, so unchanged repositories cost a single ``ls-remote``.
+
+    Args:
+        github_url: URL of the GitHub repository.
+        package_name: Name to use for the cached directory.
+        cache_dir: Directory holding cached clones.
+        timeout: Timeout in seconds for each git operation.
+        log: Receives progress and error messages.
+
+    Returns:
+        Path to the cached repository, or None on failure.
+    """
+    target_path = cache_dir / package_name
+
+    if not (target_path / ".git").exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(target_path, ignore_errors=True)
+        return fetch_github_package(
+            github_url, package_name, cache_dir, timeout, log=log
+        )
+
+    try:
+        remote_head = _run_git(["ls-remote", github_url, "HEAD"], timeout).split()
+        local_head = _run_git(["rev-parse", "HEAD"], timeout, cwd=target_path)
+
+        if not remote_head or remote_head[0] != local_head:
+            log(f"  Updating cached {package_name}...")
+            _run_git(
+                ["fetch", "--filter=blob:none", "--depth", "1", "--no-tags", "origin", "HEAD"],
+                timeout,
+                cwd=target_path,
+            )
+            _run_git(["reset", "--hard", "FETCH_HEAD"], timeout, cwd=target_path)
+        else:
+            log(f"  Using cached {package_name} ({local_head[:12]})")
+            _run_git(["reset", "--hard", "HEAD"], timeout, cwd=target_path)
+
+        # Drop anything a previous benchmark run left behind.
+        _run_git(["clean", "-fdx", "--quiet"], timeout, cwd=target_path)
+        return target_path
+    except (RuntimeError, subprocess.TimeoutExpired, OSError) as e:
+        log(f"  Cached clone of {package_name} unusable ({e}), re-cloning")
+        shutil.rmtree(target_path, ignore_errors=True)
+        return fetch_github_package(
+            github_url, package_name, cache_dir, timeout, log=log
+        )
+
+
+@functools.lru_cache(maxsize=None)
 def find_type_checker_command(checker: str) -> str | None:
     """Find the command to run a type checker's LSP server.
 
+    The lookup is cached, so each checker's PATH lookup runs once per
+    process instead of once per package.
+
     Args:
         checker: Name of the type checker.
 
@@ -320,13 +395,7 @@ def find_type_checker_command(checker: str) -> str | None:
     executable = cmd_parts[0]
 
     # Check if the command exists
-    which_cmd = "where" if sys.platform == "win32" else "which"
-    result = subprocess.run(
-        [which_cmd, executable],
-        capture_output=True,
-    )
-
-    if result.returncode == 0:
+    if shutil.which(executable) is not None:
         return TYPE_CHECKER_COMMANDS[checker]
 
     return None
@@ -412,65 +481,23 @@ def _run_checkers_together(
     results: dict[str, CheckerMetrics] = {}
 
     try:
-        benchmark_runner = get_benchmark_runner()
-
-        # Build args for all checkers
-        checker_names = [name for name, _ in checkers]
-        args = [
-            "--root",
-            str(package_path),
-            "--servers",
-            ",".join(checker_names),  # Comma-separated list of servers
-            "--runs",
-            str(runs),
-            "--timeout",
-            "2",  # 2 second timeout - timeouts don't count toward latency stats
-        ]
-
-        # Add command for each checker
-        for checker, cmd in checkers:
-            args.extend([f"--{checker}-cmd", cmd])
-
-        # Disable indexing for pyright if it's in the list
-        if any(name == "pyright" for name, _ in checkers):
-            args.append("--pyright-disable-indexing")
-
-        if seed is not None:
-            args.extend(["--seed", str(seed)])
-
-        if warmup_s > 0:
-            args.extend(["--warmup", str(warmup_s)])
-
-        # Create a temp file for JSON output
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".json", delete=False
-        ) as tmp:
-            tmp_path = Path(tmp.name)
-
-        args.extend(["--json", str(tmp_path)])
-
-        # Run the benchmark with all checkers together
-        benchmark_runner(args)
-
-        # Read and parse results for all checkers
-        if tmp_path.exists():
-            try:
-                with open(tmp_path, encoding="utf-8") as f:
-                    benchmark_data: dict[str, Any] = json.load(f)
-
-                for checker, _ in checkers:
-                    results[checker] = _parse_benchmark_results(
-                        benchmark_data, checker, runs
-                    )
-            finally:
-                tmp_path.unlink(missing_ok=True)
-        else:
-            for checker, _ in checkers:
-                results[checker] = {
-                    "ok": False,
-                    "error": "No output file generated",
-                    "latency_ms": None,
-                }
+        # Run the benchmark with all checkers together. The report comes
+        # back in memory; no argv or JSON file round-trip.
+        benchmark_data = _lsp_benchmark.run(
+            root=package_path,
+            servers=checkers,
+            runs=runs,
+            seed=seed,
+            # Disable indexing for pyright if it's in the list
+            pyright_disable_indexing=any(name == "pyright" for name, _ in checkers),
+            timeout_s=2.0,  # timeouts don't count toward latency stats
+            warmup_s=warmup_s,
+        )
+
+        for checker, _ in checkers:
+            results[checker] = _parse_benchmark_results(
+                benchmark_data, checker, runs
+            )
 
     except Exception as e:
         print(f"    Error running benchmark: {e}")
@@ -535,55 +562,60 @@ def compute_aggregate_stats(
     Returns:
         Dictionary mapping checker names to aggregate statistics.
     """
-    stats: dict[str, AggregateStats] = {}
+    latencies: dict[str, list[float]] = {c: [] for c in type_checkers}
+    totals: dict[str, dict[str, int]] = {
+        c: {"packages": 0, "runs": 0, "ok": 0, "found": 0, "valid": 0}
+        for c in type_checkers
+    }
 
-    for checker in type_checkers:
-        latencies: list[float] = []
-        valid_counts: list[int] = []
-        found_counts: list[int] = []
-        ok_counts: list[int] = []
-        total_runs = 0
-        packages_tested = 0
-
-        for result in results:
-            if result.get("error"):
-                continue
+    # Single pass over the results, updating every checker's totals
+    for result in results:
+        if result.get("error"):
+            continue
 
-            metrics = result.get("metrics", {}).get(checker, {})
-            if not metrics.get("ok"):
+        for checker, metrics in result.get("metrics", {}).items():
+            checker_totals = totals.get(checker)
+            if checker_totals is None or not metrics.get("ok"):
                 continue
 
-            packages_tested += 1
-            runs = metrics.get("runs", 0)
-            total_runs += runs
-
-            ok_counts.append(metrics.get("ok_count", 0))
-            found_counts.append(metrics.get("found_count", 0))
-            valid_counts.append(metrics.get("valid_count", 0))
+            checker_totals["packages"] += 1
+            checker_totals["runs"] += metrics.get("runs", 0)
+            checker_totals["ok"] += metrics.get("ok_count", 0)
+            checker_totals["found"] += metrics.get("found_count", 0)
+            checker_totals["valid"] += metrics.get("valid_count", 0)
 
             latency = metrics.get("latency_ms") or {}
             mean_latency = latency.get("mean")
             if mean_latency is not None:
-                latencies.append(float(mean_latency))
+                latencies[checker].append(float(mean_latency))
+
+    stats: dict[str, AggregateStats] = {}
+
+    for checker in type_checkers:
+        checker_totals = totals[checker]
+        checker_latencies = latencies[checker]
+        total_runs = checker_totals["runs"]
 
         avg_latency: float | None = None
         min_latency: float | None = None
         max_latency: float | None = None
 
-        if latencies:
-            avg_latency = sum(latencies) / len(latencies)
-            min_latency = min(latencies)
-            max_latency = max(latencies)
+        if checker_latencies:
+            avg_latency = sum(checker_latencies) / len(checker_latencies)
+            min_latency = min(checker_latencies)
+            max_latency = max(checker_latencies)
 
-        ok_rate = (sum(ok_counts) / total_runs * 100) if total_runs > 0 else 0.0
-        success_rate = (sum(valid_counts) / total_runs * 100) if total_runs > 0 else 0.0
+        ok_rate = (checker_totals["ok"] / total_runs * 100) if total_runs > 0 else 0.0
+        success_rate = (
+            (checker_totals["valid"] / total_runs * 100) if total_runs > 0 else 0.0
+        )
 
         stats[checker] = {
-            "packages_tested": packages_tested,
+            "packages_tested": checker_totals["packages"],
             "total_runs": total_runs,
-            "total_ok": sum(ok_counts),
-            "total_found": sum(found_counts),
-            "total_valid": sum(valid_counts),
+            "total_ok": checker_totals["ok"],
+            "total_found": checker_totals["found"],
+            "total_valid": checker_totals["valid"],
             "avg_latency_ms": avg_latency,
             "min_latency_ms": min_latency,
             "max_latency_ms": max_latency,
@@ -632,6 +664,7 @@ def run_daily_benchmark(
     seed: int | None = None,
     os_name: str | None = None,
     warmup_s: float = 0.0,
+    repo_cache: Path | None = None,
 ) -> Path:
     """Run the daily benchmark suite.
 
@@ -643,6 +676,8 @@ def run_daily_benchmark(
         output_dir: Directory to write results to.
         seed: Random seed for reproducibility.
         os_name: OS name to include in output filename (e.g., ubuntu, macos, windows).
+        repo_cache: Directory of persistent clones reused across runs. When
+                    None, packages are cloned into a temporary directory.
 
     Returns:
         Path to the output JSON file.
@@ -673,7 +708,17 @@ def run_daily_benchmark(
         print(f"  {name}: {version}")
     print()
 
-    all_results = _run_all_benchmarks(packages, type_checkers, runs_per_package, seed, warmup_s=warmup_s)
+    # Results are appended here as each package finishes so a crash late in
+    # a long run keeps everything benchmarked so far. A re-run on the same
+    # day starts the file afresh.
+    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    os_suffix = f"_{os_name}" if os_name else ""
+    progress_file = output_dir / f"benchmark_{date_str}{os_suffix}.partial.jsonl"
+
+    all_results = _run_all_benchmarks(
+        packages, type_checkers, runs_per_package, seed,
+        warmup_s=warmup_s, repo_cache=repo_cache, progress_file=progress_file,
+    )
 
     # Compute aggregate statistics
     aggregate_stats = compute_aggregate_stats(all_results, type_checkers)
@@ -689,6 +734,7 @@ def run_daily_benchmark(
         output_dir,
         os_name,
     )
+    progress_file.unlink(missing_ok=True)
 
     print("\n" + "=" * 70)
     print("Benchmark Complete!")
@@ -721,6 +767,8 @@ def _run_all_benchmarks(
     runs_per_package: int,
     seed: int | None,
     warmup_s: float = 0.0,
+    repo_cache: Path | None = None,
+    progress_file: Path | None = None,
 ) -> list[PackageResult]:
     """Run benchmarks for all packages.
 
@@ -731,50 +779,132 @@ def _run_all_benchmarks(
         seed: Random seed for reproducibility.
         warmup_s: Seconds to wait after opening a document before sending
                   the definition request.
+        repo_cache: Directory of persistent clones reused across runs.
+        progress_file: JSON Lines file, truncated at the start of the run,
+                       that each result is appended to (and synced to
+                       disk) as soon as its package finishes.
 
     Returns:
         List of package results.
     """
     all_results: list[PackageResult] = []
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
+    with contextlib.ExitStack() as stack:
+        # Entered before the executor so the clone directory outlives any
+        # clone still running when the stack unwinds.
+        temp_path = (
+            Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            if repo_cache is None
+            else None
+        )
+        # A single worker clones the next package while the current one is
+        # benchmarked; prefetching further ahead would compete with the timed
+        # servers for CPU, disk and network.
+        executor = stack.enter_context(
+            concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        )
+        progress = (
+            stack.enter_context(open(progress_file, "w", encoding="utf-8"))
+            if progress_file is not None
+            else None
+        )
+
+        def _prefetch(
+            index: int,
+        ) -> tuple[concurrent.futures.Future[Path | None], list[str]] | None:
+            # Clone messages are buffered and printed under the package's own
+            # header instead of interleaving with the running benchmark.
+            if index >= len(packages):
+                return None
+            messages: list[str] = []
+            future = executor.submit(
+                _clone_package, packages[index], temp_path, repo_cache,
+                messages.append,
+            )
+            return future, messages
 
-        for i, package in enumerate(packages, 1):
-            package_name = package["name"]
-            github_url = package.get("github_url")
+        next_clone = _prefetch(0)
+        for index, package in enumerate(packages):
+            assert next_clone is not None
+            future, messages = next_clone
+            print(f"\n[{index + 1}/{len(packages)}] Processing {package['name']}")
 
-            print(f"\n[{i}/{len(packages)}] Processing {package_name}")
+            try:
+                package_path = future.result()
+            except Exception as e:
+                messages.append(f"  Error cloning {package['name']}: {e}")
+                package_path = None
+            next_clone = _prefetch(index + 1)
+
+            for message in messages:
+                print(message)
 
             result = _benchmark_single_package(
-                package, github_url, temp_path, type_checkers, runs_per_package, seed,
-                warmup_s=warmup_s,
+                package, package.get("github_url"), package_path,
+                type_checkers, runs_per_package, seed,
+                warmup_s=warmup_s, cleanup=repo_cache is None,
             )
             all_results.append(result)
 
+            if progress is not None:
+                progress.write(json.dumps(result) + "\n")
+                progress.flush()
+                os.fsync(progress.fileno())
+
     return all_results
 
 
+def _clone_package(
+    package: PackageInfo,
+    temp_path: Path | None,
+    repo_cache: Path | None = None,
+    log: Callable[[str], None] = print,
+) -> Path | None:
+    """Clone a package's repository, returning None if it has no GitHub URL.
+
+    Args:
+        package: Package information.
+        temp_path: Temporary directory for cloning; required unless
+                   repo_cache is set.
+        repo_cache: Directory of persistent clones; used instead of
+                    temp_path when set.
+        log: Receives progress and error messages.
+
+    Returns:
+        Path to the cloned repository, or None if unavailable.
+    """
+    github_url = package.get("github_url")
+    if not github_url:
+        return None
+    if repo_cache is not None:
+        return get_or_update_repo(github_url, package["name"], repo_cache, log=log)
+    assert temp_path is not None
+    return fetch_github_package(github_url, package["name"], temp_path, log=log)
+
+
 def _benchmark_single_package(
     package: PackageInfo,
     github_url: str | None,
-    temp_path: Path,
+    package_path: Path | None,
     type_checkers: list[str],
     runs_per_package: int,
     seed: int | None,
     warmup_s: float = 0.0,
+    cleanup: bool = True,
 ) -> PackageResult:
-    """Benchmark a single package.
+    """Benchmark a single, already cloned package.
 
     Args:
         package: Package information.
         github_url: GitHub URL for the package.
-        temp_path: Temporary directory for cloning.
+        package_path: Path to the cloned repository, or None if cloning failed.
         type_checkers: List of type checkers to use.
         runs_per_package: Number of runs per package.
         seed: Random seed for reproducibility.
         warmup_s: Seconds to wait after opening a document before sending
                   the definition request.
+        cleanup: Remove the package directory afterwards. Disabled for
+                 clones kept in a persistent cache.
 
     Returns:
         Package result dictionary.
@@ -791,7 +921,6 @@ def _benchmark_single_package(
             "metrics": {},
         }
 
-    package_path = fetch_github_package(github_url, package_name, temp_path)
     if not package_path:
         return {
             "package_name": package_name,
@@ -831,7 +960,8 @@ def _benchmark_single_package(
         }
     finally:
         # Cleanup package directory
-        shutil.rmtree(package_path, ignore_errors=True)
+        if cleanup:
+            shutil.rmtree(package_path, ignore_errors=True)
 
 
 def _save_results(
@@ -885,12 +1015,16 @@ def _save_results(
     if os_name:
         output_data["os"] = os_name
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=2)
+    output_file.write_text(json.dumps(output_data, indent=2), encoding="utf-8")
 
-    # Also save as latest.json (or latest-{os}.json) for the web page
-    with open(latest_file, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=2)
+    # Also expose it as latest.json (or latest-{os}.json) for the web page.
+    # A hardlink avoids writing the payload twice; copy if linking fails
+    # (e.g. filesystems without hardlink support).
+    latest_file.unlink(missing_ok=True)
+    try:
+        os.link(output_file, latest_file)
+    except OSError:
+        shutil.copyfile(output_file, latest_file)
 
     print(f"  {latest_file}")
 
@@ -964,6 +1098,14 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         help="Seconds to wait after initialization before sending definition "
         "requests. Gives the server time to index/analyze (default: 30).",
     )
+    parser.add_argument(
+        "--repo-cache",
+        type=Path,
+        default=None,
+        help="Directory to keep package clones in between runs. Repositories "
+        "are only re-fetched when their remote HEAD has changed "
+        "(default: clone into a temporary directory).",
+    )
 
     return parser.parse_args(argv)
 
@@ -988,6 +1130,7 @@ def main(argv: list[str] | None = None) -> int:
         seed=args.seed,
         os_name=args.os_name,
         warmup_s=args.warmup,
+        repo_cache=args.repo_cache,
     )
 
     return 0
@@ -32,9 +32,12 @@ python tools/lsp_bench/lsp_bench.py ^
 from __future__ import annotations
 
 import argparse
+import array
 import ast
+import collections
 import concurrent.futures
 import dataclasses
+import functools
 import json
 import os
 import queue
@@ -46,25 +49,25 @@ import threading
 import time
 import traceback
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
 
 
 JsonObj = Dict[str, Any]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Position:
     line: int
     character: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Range:
     start: Position
     end: Position
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Location:
     uri: str
     range: Range
@@ -91,6 +94,8 @@ class BenchmarkCase:
     token: str
     line_text: str
     kind: str = "unknown"
+    # File contents as read when the case was picked, reused for didOpen.
+    source_text: Optional[str] = None
 
 
 def _path_to_uri(path: Path) -> str:
@@ -113,9 +118,44 @@ def _uri_to_path(uri: str) -> Path:
 
 _IDENTIFIER_RE = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
 
+_CONTENT_LENGTH_RE = re.compile(rb"content-length:[ \t]*(\d+)", re.IGNORECASE)
 
-@dataclasses.dataclass
-class _AstOccurrence:
+# Blank line ending a header block. Lines may end in CRLF or a bare LF, as
+# some servers send LF-only headers.
+_HEADER_END_RE = re.compile(rb"\n\r?\n")
+
+# Bytes requested per read from a server's stdout.
+_RX_CHUNK_SIZE = 65536
+
+# POSIX only; elsewhere _send falls back to one concatenated write.
+_HAS_WRITEV = hasattr(os, "writev")
+
+# Shared compact encoder: json.dumps() with non-default options builds a new
+# JSONEncoder per call. Non-ASCII text goes out as UTF-8 rather than \u escapes,
+# which keeps didOpen bodies for non-English sources small.
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+# Builtins/typing primitives that rarely make interesting go-to-definition targets.
+_BANNED = frozenset({
+    "True",
+    "False",
+    "None",
+    "self",
+    "cls",
+    "int",
+    "str",
+    "float",
+    "bool",
+    "list",
+    "dict",
+    "set",
+    "tuple",
+    "object",
+})
+
+
+class _AstOccurrence(NamedTuple):
     line_1b: int
     col_0b: int
     token: str
@@ -136,14 +176,11 @@ def _token_from_line_at(lines: List[str], line_1b: int, col_0b: int) -> Optional
     s = lines[line0]
     if col_0b < 0 or col_0b >= len(s):
         return None
-    m = _IDENTIFIER_RE.search(s, pos=col_0b)
+    # Only an identifier starting exactly at col counts (the \b before it
+    # sees the character preceding col, so mid-identifier columns don't match).
+    m = _IDENTIFIER_RE.match(s, col_0b)
     if not m:
         return None
-    # Ensure the match actually covers the caret position (common for ast col offsets).
-    if not (m.start() <= col_0b <= m.end()):
-        # fall back to nearest identifier that starts at col
-        if m.start() != col_0b:
-            return None
     return m.group(0)
 
 
@@ -163,56 +200,37 @@ def _collect_ast_occurrences(src: str) -> List[_AstOccurrence]:
     except SyntaxError:
         return []
 
-    # Collect imported names so we can bias toward "clickable" symbols.
+    # Collect imported names so we can bias toward "clickable" symbols. They
+    # are gathered in the same pass as the occurrences, so each occurrence
+    # records the name deciding its "imported_" kind and is resolved at the end.
     imported_names: set[str] = set()
     imported_modules: set[str] = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
+
+    # (line_1b, col_0b, token, kind, name to look up, look up in modules?)
+    raw: List[Tuple[int, int, str, str, str, bool]] = []
+
+    class V(ast.NodeVisitor):
+        def visit_Import(self, node: ast.Import) -> None:
             for alias in node.names:
                 asname = alias.asname or alias.name.split(".")[0]
                 imported_names.add(asname)
                 imported_modules.add(asname)
-        elif isinstance(node, ast.ImportFrom):
+
+        def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
             for alias in node.names:
                 if alias.name == "*":
                     continue
                 asname = alias.asname or alias.name
                 imported_names.add(asname)
 
-    banned = {
-        "True",
-        "False",
-        "None",
-        "self",
-        "cls",
-        "int",
-        "str",
-        "float",
-        "bool",
-        "list",
-        "dict",
-        "set",
-        "tuple",
-        "object",
-    }
-
-    occ: List[_AstOccurrence] = []
-
-    class V(ast.NodeVisitor):
         def visit_Name(self, node: ast.Name) -> None:
             if (
-                node.id not in banned
+                node.id not in _BANNED
                 and hasattr(node, "lineno")
                 and hasattr(node, "col_offset")
             ):
-                kind = "imported_name" if node.id in imported_names else "name"
-                occ.append(
-                    _AstOccurrence(
-                        line_1b=int(node.lineno),
-                        col_0b=int(node.col_offset),
-                        token=node.id,
-                        kind=kind,
-                    )
+                raw.append(
+                    (int(node.lineno), int(node.col_offset), node.id, "name", node.id, False)
                 )
             self.generic_visit(node)
 
@@ -221,21 +239,16 @@ def _collect_ast_occurrences(src: str) -> List[_AstOccurrence]:
             # We don't have end offsets on all Python versions, so compute `y` column
             # by searching within the source line.
             if (
-                node.attr in banned
+                node.attr in _BANNED
                 or not hasattr(node, "lineno")
                 or not hasattr(node, "col_offset")
             ):
                 self.generic_visit(node)
                 return
-            lineno = int(node.lineno)
-            col0 = int(node.col_offset)
             # We'll patch the column later using the raw line when we build cases.
-            base_is_imported_module = (
-                isinstance(node.value, ast.Name) and node.value.id in imported_modules
-            )
-            kind = "imported_attr" if base_is_imported_module else "attr"
-            occ.append(
-                _AstOccurrence(line_1b=lineno, col_0b=col0, token=node.attr, kind=kind)
+            base = node.value.id if isinstance(node.value, ast.Name) else ""
+            raw.append(
+                (int(node.lineno), int(node.col_offset), node.attr, "attr", base, True)
             )
             self.generic_visit(node)
 
@@ -244,72 +257,81 @@ def _collect_ast_occurrences(src: str) -> List[_AstOccurrence]:
             fn = node.func
             if (
                 isinstance(fn, ast.Name)
-                and fn.id not in banned
+                and fn.id not in _BANNED
                 and hasattr(fn, "lineno")
                 and hasattr(fn, "col_offset")
             ):
-                kind = "imported_call" if fn.id in imported_names else "call"
-                occ.append(
-                    _AstOccurrence(
-                        line_1b=int(fn.lineno),
-                        col_0b=int(fn.col_offset),
-                        token=fn.id,
-                        kind=kind,
-                    )
+                raw.append(
+                    (int(fn.lineno), int(fn.col_offset), fn.id, "call", fn.id, False)
                 )
             elif (
                 isinstance(fn, ast.Attribute)
-                and fn.attr not in banned
+                and fn.attr not in _BANNED
                 and hasattr(fn, "lineno")
                 and hasattr(fn, "col_offset")
             ):
-                base_is_imported_module = (
-                    isinstance(fn.value, ast.Name) and fn.value.id in imported_modules
-                )
-                kind = "imported_attr_call" if base_is_imported_module else "attr_call"
-                occ.append(
-                    _AstOccurrence(
-                        line_1b=int(fn.lineno),
-                        col_0b=int(fn.col_offset),
-                        token=fn.attr,
-                        kind=kind,
-                    )
+                base = fn.value.id if isinstance(fn.value, ast.Name) else ""
+                raw.append(
+                    (int(fn.lineno), int(fn.col_offset), fn.attr, "attr_call", base, True)
                 )
             self.generic_visit(node)
 
     V().visit(tree)
+
+    occ: List[_AstOccurrence] = []
+    for line_1b, col_0b, token, kind, ref, ref_is_module in raw:
+        if ref in (imported_modules if ref_is_module else imported_names):
+            kind = f"imported_{kind}"
+        occ.append(_AstOccurrence(line_1b=line_1b, col_0b=col_0b, token=token, kind=kind))
     return occ
 
 
+# Common virtualenv/build/cache folders, skipped to avoid huge scans and noise.
+_EXCLUDED_DIR_NAMES = frozenset({
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    ".tox",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    "node_modules",
+    "build",
+    "dist",
+    ".eggs",
+    ".idea",
+    ".vscode",
+})
+
+
+@functools.lru_cache(maxsize=4)
+def _discover_py_files(root: Path) -> Tuple[Path, ...]:
+    # Walk with os.scandir so excluded folders are pruned instead of descended
+    # into and filtered afterwards. Cached so --runs N scans the repo once;
+    # run() clears the cache so a later run sees the tree as it is then.
+    found: List[Path] = []
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.lower() not in _EXCLUDED_DIR_NAMES:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(".py"):
+                        found.append(Path(entry.path))
+        except OSError:
+            continue
+    # Sort so a given --seed picks the same files regardless of scandir order.
+    return tuple(sorted(found))
+
+
 def pick_random_python_file(root: Path, *, rng: random.Random) -> Path:
     # Generic, cross-project discovery: pick any Python file under root.
-    # Exclude common virtualenv/build/cache folders to avoid huge scans and noise.
-    candidates: List[Path] = []
-
-    excluded_dir_names = {
-        ".git",
-        ".hg",
-        ".svn",
-        ".venv",
-        "venv",
-        ".tox",
-        "__pycache__",
-        ".mypy_cache",
-        ".pytest_cache",
-        ".ruff_cache",
-        "node_modules",
-        "build",
-        "dist",
-        ".eggs",
-        ".idea",
-        ".vscode",
-    }
-
-    for p in root.rglob("*.py"):
-        parts_lower = {s.lower() for s in p.parts}
-        if any(excl in parts_lower for excl in excluded_dir_names):
-            continue
-        candidates.append(p)
+    candidates = _discover_py_files(root)
 
     if not candidates:
         raise RuntimeError(
@@ -342,24 +364,38 @@ def pick_random_case(
     )
 
 
+@functools.lru_cache(maxsize=256)
+def _load_source(
+    path: Path, mtime_ns: int, size: int
+) -> Tuple[str, List[str], List[_AstOccurrence]]:
+    # Cached by (path, mtime, size): files re-picked across runs/retries are
+    # read and parsed once. Callers must not mutate the returned lists.
+    text = path.read_text(encoding="utf-8", errors="replace")
+    return text, text.splitlines(), _collect_ast_occurrences(text)
+
+
 def pick_random_identifier_case(
     file_path: Path, *, rng: random.Random
 ) -> BenchmarkCase:
-    text = file_path.read_text(encoding="utf-8", errors="replace")
-    lines = text.splitlines()
-
+    st = file_path.stat()
     # Prefer AST-derived occurrences so we target a *real* symbol.
-    ast_occ = _collect_ast_occurrences(text)
+    text, lines, ast_occ = _load_source(file_path, st.st_mtime_ns, st.st_size)
     candidates: List[Tuple[int, int, str, str]] = []
     for o in ast_occ:
         line0 = o.line_1b - 1
         if not (0 <= line0 < len(lines)):
             continue
 
-        # For Attribute nodes we recorded col_offset of the base; try to locate the attribute token on the line.
+        # ast col_offset counts UTF-8 bytes; positions here are str indices.
+        line = lines[line0]
         col0 = o.col_0b
-        if o.token and o.token != "":
-            idx = lines[line0].find(o.token)
+        if not line.isascii():
+            col0 = len(line.encode("utf-8")[:col0].decode("utf-8", errors="ignore"))
+
+        # For Attribute nodes we recorded col_offset of the base; try to locate the attribute token on the line.
+        # Name/Call offsets already point at the token itself.
+        if "attr" in o.kind and o.token:
+            idx = line.find(o.token)
             if idx != -1:
                 col0 = idx
 
@@ -372,25 +408,11 @@ def pick_random_identifier_case(
 
     # Fallback: regex scan if AST yields nothing (syntax errors, doc-only files, etc.)
     if not candidates:
+        finditer = _IDENTIFIER_RE.finditer
         for i, line in enumerate(lines):
-            for m in _IDENTIFIER_RE.finditer(line):
+            for m in finditer(line):
                 tok = m.group(0)
-                if tok in {
-                    "True",
-                    "False",
-                    "None",
-                    "self",
-                    "cls",
-                    "int",
-                    "str",
-                    "float",
-                    "bool",
-                    "list",
-                    "dict",
-                    "set",
-                    "tuple",
-                    "object",
-                }:
+                if tok in _BANNED:
                     continue
                 candidates.append((i, m.start(), tok, "regex"))
 
@@ -416,6 +438,7 @@ def pick_random_identifier_case(
         token=tok,
         line_text=_safe_line(lines, line),
         kind=kind,
+        source_text=text,
     )
 
 
@@ -423,6 +446,16 @@ class LspProtocolError(RuntimeError):
     pass
 
 
+class _Waiter:
+    """Single-shot handoff of a response from the reader thread to request()."""
+
+    __slots__ = ("event", "msg")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.msg: Optional[JsonObj] = None
+
+
 class LspClient:
     def __init__(self, name: str, argv: List[str], root: Path, *, trace: bool = False):
         self.name = name
@@ -434,10 +467,13 @@ class LspClient:
         self._rx_thread: Optional[threading.Thread] = None
         self._stderr_thread: Optional[threading.Thread] = None
         self._rx_queue: "queue.Queue[JsonObj]" = queue.Queue()
-        self._pending: Dict[Union[int, str], "queue.Queue[JsonObj]"] = {}
+        self._pending: Dict[Union[int, str], _Waiter] = {}
+        # Guards _pending and _next_id, shared with the reader thread.
+        self._pending_lock = threading.Lock()
         self._next_id = 1
         self._shutdown = False
-        self._stderr_tail: "queue.Queue[str]" = queue.Queue(maxsize=200)
+        # Bounded tail of server stderr, shown when a request times out.
+        self._stderr_tail: Deque[str] = collections.deque(maxlen=200)
 
     def __enter__(self) -> "LspClient":
         self.start()
@@ -485,35 +521,17 @@ class LspClient:
                 line = stream.readline()
                 if not line:
                     return
-                s = line.decode("utf-8", errors="replace").rstrip("\r\n")
-                # keep a bounded tail
-                try:
-                    if self._stderr_tail.full():
-                        _ = self._stderr_tail.get_nowait()
-                    self._stderr_tail.put_nowait(s)
-                except Exception:
-                    # Best-effort only: failure to record stderr should not affect
-                    # the running client, so ignore any queue-related errors here.
-                    pass
+                # keep a bounded tail (the deque drops the oldest line)
+                self._stderr_tail.append(
+                    line.decode("utf-8", errors="replace").rstrip("\r\n")
+                )
         except Exception:
             # Stream read failed (e.g., process terminated). Exit reader thread gracefully.
             return
 
     def _stderr_tail_text(self, max_lines: int = 40) -> str:
-        # queue.Queue doesn't support snapshot; drain to list then requeue.
-        lines: List[str] = []
-        try:
-            while True:
-                lines.append(self._stderr_tail.get_nowait())
-        except queue.Empty:
-            pass
-        for s in lines:
-            try:
-                self._stderr_tail.put_nowait(s)
-            except Exception:
-                # Best-effort requeue of stderr tail; drop lines if the buffer is full.
-                pass
-        tail = lines[-max_lines:]
+        # deque.copy() is a single C call, so it can't race with the reader's append.
+        tail = list(self._stderr_tail.copy())[-max_lines:]
         return "\n".join(tail)
 
     def stop(self) -> None:
@@ -634,23 +652,26 @@ class LspClient:
         self._send({"jsonrpc": "2.0", "method": method, "params": params})
 
     def request(self, method: str, params: Any, *, timeout_s: float = 30.0) -> JsonObj:
-        req_id = self._next_id
-        self._next_id += 1
-
-        waiter: "queue.Queue[JsonObj]" = queue.Queue(maxsize=1)
-        self._pending[req_id] = waiter
-        self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+        waiter = _Waiter()
+        with self._pending_lock:
+            req_id = self._next_id
+            self._next_id += 1
+            self._pending[req_id] = waiter
 
         try:
-            resp = waiter.get(timeout=timeout_s)
-        except queue.Empty as e:
-            tail = self._stderr_tail_text()
-            extra = f"\n--- {self.name} stderr (tail) ---\n{tail}" if tail else ""
-            raise TimeoutError(
-                f"{self.name}: timeout waiting for response to {method}{extra}"
-            ) from e
+            self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+            if not waiter.event.wait(timeout_s):
+                tail = self._stderr_tail_text()
+                extra = f"\n--- {self.name} stderr (tail) ---\n{tail}" if tail else ""
+                raise TimeoutError(
+                    f"{self.name}: timeout waiting for response to {method}{extra}"
+                )
         finally:
-            self._pending.pop(req_id, None)
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+
+        resp = waiter.msg
+        assert resp is not None
 
         if "error" in resp:
             raise LspProtocolError(
@@ -662,51 +683,74 @@ class LspClient:
         if self._proc is None or self._proc.stdin is None:
             raise RuntimeError(f"{self.name}: process not started")
 
-        body = json.dumps(msg, separators=(",", ":")).encode("utf-8")
+        body = _JSON_ENCODER.encode(msg).encode("utf-8")
         header = f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
 
         if self.trace:
             sys.stderr.write(f"[{self.name} ->] {msg.get('method', 'response')}\n")
 
-        self._proc.stdin.write(header)
-        self._proc.stdin.write(body)
-        self._proc.stdin.flush()
+        # One write per message instead of separate header/body writes. stdin
+        # is unbuffered, so loop in case the pipe accepts a partial write.
+        if _HAS_WRITEV:
+            # writev(2) takes both buffers directly, so a large didOpen body
+            # is never copied just to prepend its header.
+            fd = self._proc.stdin.fileno()
+            bufs = [memoryview(header), memoryview(body)]
+            while bufs:
+                written = os.writev(fd, bufs)
+                while bufs and written >= len(bufs[0]):
+                    written -= len(bufs.pop(0))
+                if written:
+                    bufs[0] = bufs[0][written:]
+        else:
+            data = memoryview(header + body)
+            while data:
+                written = self._proc.stdin.write(data)
+                data = data[written:]
+            self._proc.stdin.flush()
 
     def _rx_loop(self) -> None:
         assert self._proc is not None
         assert self._proc.stdout is not None
 
-        stream = self._proc.stdout
+        # stdout is unbuffered (bufsize=0), so readline() would issue one read
+        # syscall per byte. Read large chunks into a buffer and split the
+        # Content-Length framed messages out of it instead.
+        fd = self._proc.stdout.fileno()
+        buf = bytearray()
         try:
             while True:
-                headers: Dict[str, str] = {}
-                # Read headers until blank line
-                while True:
-                    line = stream.readline()
-                    if not line:
+                blank_line = _HEADER_END_RE.search(buf)
+                if blank_line is None:
+                    chunk = os.read(fd, _RX_CHUNK_SIZE)
+                    if not chunk:
                         return
-                    if line in (b"\r\n", b"\n"):
-                        break
-                    try:
-                        k, v = line.decode("ascii", errors="replace").split(":", 1)
-                    except ValueError:
-                        continue
-                    headers[k.strip().lower()] = v.strip()
-
-                if "content-length" not in headers:
+                    buf += chunk
                     continue
 
-                try:
-                    length = int(headers["content-length"])
-                except ValueError:
+                header_end, body_start = blank_line.span()
+                m = _CONTENT_LENGTH_RE.search(buf, 0, header_end)
+                if m is None:
+                    del buf[:body_start]
                     continue
 
-                body = stream.read(length)
-                if not body:
-                    return
+                body_end = body_start + int(m.group(1))
+                while len(buf) < body_end:
+                    chunk = os.read(fd, max(_RX_CHUNK_SIZE, body_end - len(buf)))
+                    if not chunk:
+                        return
+                    buf += chunk
+
+                body = bytes(buf[body_start:body_end])
+                del buf[:body_end]
 
                 try:
-                    msg = json.loads(body.decode("utf-8", errors="replace"))
+                    # json.loads decodes UTF-8 bytes itself; only invalid input
+                    # pays for an explicit decode with replacement characters.
+                    try:
+                        msg = json.loads(body)
+                    except UnicodeDecodeError:
+                        msg = json.loads(body.decode("utf-8", errors="replace"))
                 except Exception:
                     continue
 
@@ -719,8 +763,13 @@ class LspClient:
                         )
 
                 # Route responses by id, else enqueue
-                if "id" in msg and msg.get("id") in self._pending:
-                    self._pending[msg["id"]].put(msg)
+                waiter: Optional[_Waiter] = None
+                if "id" in msg:
+                    with self._pending_lock:
+                        waiter = self._pending.get(msg["id"])
+                if waiter is not None:
+                    waiter.msg = msg
+                    waiter.event.set()
                 else:
                     self._rx_queue.put(msg)
         except Exception:
@@ -729,53 +778,63 @@ class LspClient:
                 traceback.print_exc()
 
 
+def _location_from(obj: Any) -> Optional[Location]:
+    if not isinstance(obj, dict):
+        return None
+    if "targetUri" in obj and "targetRange" in obj:
+        # LocationLink
+        uri = obj["targetUri"]
+        r = obj["targetRange"]
+    elif "uri" in obj and "range" in obj:
+        uri = obj["uri"]
+        r = obj["range"]
+    else:
+        return None
+
+    try:
+        return Location(
+            uri=str(uri),
+            range=Range(
+                start=Position(
+                    line=int(r["start"]["line"]),
+                    character=int(r["start"]["character"]),
+                ),
+                end=Position(
+                    line=int(r["end"]["line"]), character=int(r["end"]["character"])
+                ),
+            ),
+        )
+    except Exception:
+        return None
+
+
 def _parse_definition_result(result: Any) -> List[Location]:
     if result is None:
         return []
 
-    def loc_from(obj: Any) -> Optional[Location]:
-        if not isinstance(obj, dict):
-            return None
-        if "targetUri" in obj and "targetRange" in obj:
-            # LocationLink
-            uri = obj["targetUri"]
-            r = obj["targetRange"]
-        elif "uri" in obj and "range" in obj:
-            uri = obj["uri"]
-            r = obj["range"]
-        else:
-            return None
-
-        try:
-            return Location(
-                uri=str(uri),
-                range=Range(
-                    start=Position(
-                        line=int(r["start"]["line"]),
-                        character=int(r["start"]["character"]),
-                    ),
-                    end=Position(
-                        line=int(r["end"]["line"]), character=int(r["end"]["character"])
-                    ),
-                ),
-            )
-        except Exception:
-            return None
+    # Fast path: a single Location/LocationLink object.
+    if not isinstance(result, list):
+        loc = _location_from(result)
+        return [loc] if loc else []
 
     locs: List[Location] = []
-    if isinstance(result, list):
-        for item in result:
-            loc = loc_from(item)
-            if loc:
-                locs.append(loc)
-    else:
-        loc = loc_from(result)
+    for item in result:
+        loc = _location_from(item)
         if loc:
             locs.append(loc)
-
     return locs
 
 
+@functools.lru_cache(maxsize=4096)
+def _resolve_uri(uri: str) -> Optional[Path]:
+    # Definition results keep pointing into the same handful of files
+    # (stdlib, typeshed, the file itself), so cache resolution per URI.
+    try:
+        return _uri_to_path(uri).resolve()
+    except Exception:
+        return None
+
+
 def _looks_like_valid_location(
     loc: Location, repo_root: Path, *, source_uri: str = ""
 ) -> bool:
@@ -784,10 +843,7 @@ def _looks_like_valid_location(
     # Note: we intentionally do *not* require the file to live under --root.
     # Many servers legally return locations in stdlib, site-packages, or vendored
     # typeshed, and the caller considers that a "pass".
-    p = _uri_to_path(loc.uri)
-    try:
-        p.resolve()
-    except Exception:
+    if _resolve_uri(loc.uri) is None:
         return False
 
     if loc.range.start.line < 0 or loc.range.start.character < 0:
@@ -863,7 +919,9 @@ def run_server_batch(
         max_consecutive_timeouts = 5
 
         for case in cases:
-            text = case.file_path.read_text(encoding="utf-8", errors="replace")
+            text = case.source_text
+            if text is None:
+                text = case.file_path.read_text(encoding="utf-8", errors="replace")
             lsp.open_document(case.uri, text)
             # Brief pause to let the server process the opened document,
             # mimicking real IDE usage where users don't instantly request
@@ -913,7 +971,47 @@ def _split_command(cmd: str) -> List[str]:
     return argv
 
 
-def main(argv: Optional[List[str]] = None) -> int:
+def _position_payload(pos: Position) -> Dict[str, int]:
+    # Same shape as dataclasses.asdict(pos), without its recursive deepcopy.
+    return {"line": pos.line, "character": pos.character}
+
+
+def _locations_payload(
+    locations: List[Location], repo_root: Path, *, source_uri: str
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Report entries for a result's locations, and whether any is valid."""
+    payload: List[Dict[str, Any]] = []
+    any_valid = False
+    for loc in locations:
+        valid = _looks_like_valid_location(loc, repo_root, source_uri=source_uri)
+        any_valid = any_valid or valid
+        payload.append({
+            "uri": loc.uri,
+            "start": _position_payload(loc.range.start),
+            "end": _position_payload(loc.range.end),
+            "valid": valid,
+        })
+    return payload, any_valid
+
+
+def _case_meta(case: BenchmarkCase) -> Dict[str, Any]:
+    """Report fields describing a picked case (shared by picked/unresolved)."""
+    line = case.position.line
+    character = case.position.character
+    return {
+        "file": str(case.file_path),
+        "uri": case.uri,
+        "line": line,
+        "character": character,
+        "line_1b": line + 1,
+        "character_1b": character + 1,
+        "token": case.token,
+        "kind": case.kind,
+        "line_text": case.line_text,
+    }
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument(
         "--root", type=Path, default=Path.cwd(), help="Repo root (workspace folder)"
@@ -1000,23 +1098,10 @@ def main(argv: Optional[List[str]] = None) -> int:
         default=None,
         help="Write machine-readable JSON report",
     )
-    args = ap.parse_args(argv)
-
-    root = args.root.resolve()
-    rng = random.Random(args.seed)
+    return ap
 
-    runs = max(1, int(args.runs))
-
-    report: Dict[str, Any] = {
-        "root": str(root),
-        "seed": args.seed,
-        "runs": runs,
-        "servers": [],
-        "cases": [],
-        "summary": {},
-        "ts": time.time(),
-    }
 
+def _run_from_args(args: argparse.Namespace) -> Dict[str, Any]:
     # Optional configuration payload to push after initialized.
     settings_payload: Any = None
     if args.settings_json is not None:
@@ -1025,23 +1110,6 @@ def main(argv: Optional[List[str]] = None) -> int:
         except Exception as e:
             raise SystemExit(f"--settings-json must be valid JSON: {e}")
 
-    if args.pyright_disable_indexing:
-        pyright_settings = {
-            "python": {
-                "analysis": {
-                    "indexing": False,
-                    "autoSearchPaths": False,
-                    "useLibraryCodeForTypes": False,
-                }
-            }
-        }
-        if settings_payload is None:
-            settings_payload = pyright_settings
-        elif isinstance(settings_payload, dict) and isinstance(pyright_settings, dict):
-            # Shallow merge: user settings win at top-level keys.
-            settings_payload = {**pyright_settings, **settings_payload}
-        # else: if user provided non-dict JSON, keep it as-is.
-
     supported = {"pyrefly", "ty", "zuban", "pyright"}
 
     def _provided(cmd: Optional[str]) -> bool:
@@ -1090,11 +1158,84 @@ def main(argv: Optional[List[str]] = None) -> int:
     if "pyright" in requested:
         servers.append(("pyright", _need("pyright", args.pyright_cmd)))
 
+    return run(
+        root=args.root,
+        servers=servers,
+        runs=args.runs,
+        seed=args.seed,
+        settings=settings_payload,
+        pyright_disable_indexing=args.pyright_disable_indexing,
+        trace=args.trace,
+        timeout_s=float(args.timeout_s),
+        warmup_s=float(args.warmup_s),
+    )
+
+
+def run(
+    *,
+    root: Path,
+    servers: List[Tuple[str, str]],
+    runs: int = 1,
+    seed: Optional[int] = None,
+    settings: Any = None,
+    pyright_disable_indexing: bool = False,
+    trace: bool = False,
+    timeout_s: float = 2.0,
+    warmup_s: float = 0.0,
+) -> Dict[str, Any]:
+    """Benchmark Go to Definition across servers and return the report.
+
+    This is the typed entry point behind main(): callers that already hold
+    structured options (e.g. the daily runner) call it directly instead of
+    building an argv list.
+
+    servers is a list of (name, command) pairs. settings is sent to every
+    server via workspace/didChangeConfiguration; pyright_disable_indexing
+    merges Pyright's no-indexing settings into it.
+    """
+    root = root.resolve()
+    rng = random.Random(seed)
+    _discover_py_files.cache_clear()
+
+    runs = max(1, int(runs))
+
+    report: Dict[str, Any] = {
+        "root": str(root),
+        "seed": seed,
+        "runs": runs,
+        "servers": [],
+        "cases": [],
+        "summary": {},
+        "ts": time.time(),
+    }
+
+    settings_payload: Any = settings
+    if pyright_disable_indexing:
+        pyright_settings = {
+            "python": {
+                "analysis": {
+                    "indexing": False,
+                    "autoSearchPaths": False,
+                    "useLibraryCodeForTypes": False,
+                }
+            }
+        }
+        if settings_payload is None:
+            settings_payload = pyright_settings
+        elif isinstance(settings_payload, dict) and isinstance(pyright_settings, dict):
+            # Shallow merge: user settings win at top-level keys.
+            settings_payload = {**pyright_settings, **settings_payload}
+        # else: if user provided non-dict JSON, keep it as-is.
+
     report["servers"] = [name for name, _ in servers]
 
-    # Aggregation buckets
+    # Aggregation buckets. Latencies go into a flat array of doubles rather
+    # than a list of boxed floats.
     agg: Dict[str, Dict[str, Any]] = {
-        name: {"ok": 0, "found": 0, "valid": 0, "latencies_ms": [], "errors": 0, "timeouts": 0}
+        name: {
+            "ok": 0, "found": 0, "valid": 0, "latencies_ms": array.array("d"),
+            "errors": 0, "timeouts": 0,
+        }
         for name, _ in servers
     }
 
@@ -1102,34 +1243,27 @@ def main(argv: Optional[List[str]] = None) -> int:
     cases = [pick_random_case(root, rng=rng) for _ in range(runs)]
 
     # Pre-populate case_payloads so all servers can write into them
-    for run_idx, case in enumerate(cases):
+    case_meta = [_case_meta(case) for case in cases]
+    progress_lines: List[str] = []
+    for run_idx, meta in enumerate(case_meta):
         report["cases"].append({
             "run": run_idx,
-            "picked": {
-                "file": str(case.file_path),
-                "uri": case.uri,
-                "line": case.position.line,
-                "character": case.position.character,
-                "line_1b": case.position.line + 1,
-                "character_1b": case.position.character + 1,
-                "token": case.token,
-                "kind": case.kind,
-                "line_text": case.line_text,
-            },
+            "picked": meta,
             "results": {},
             "unresolved": {},
         })
-        print(
-            f"Run {run_idx + 1}/{runs}: {case.file_path}:{case.position.line + 1}:{case.position.character + 1} token={case.token} kind={case.kind}"
+        progress_lines.append(
+            f"Run {run_idx + 1}/{runs}: {meta['file']}:{meta['line_1b']}:{meta['character_1b']} token={meta['token']} kind={meta['kind']}\n"
         )
+    # One write for the whole listing instead of a print per run.
+    sys.stdout.write("".join(progress_lines))
+    sys.stdout.flush()
 
-    def _run_one_server(server_name: str, cmd: str) -> Tuple[str, List[DefinitionResult]]:
+    def _run_one_server(
+        server_name: str, cmd: str
+    ) -> Tuple[str, List[DefinitionResult], List[Tuple[List[Dict[str, Any]], bool]]]:
         per_server_settings = settings_payload
-        if (
-            args.pyright_disable_indexing
-            and server_name != "pyright"
-            and args.settings_json is None
-        ):
+        if pyright_disable_indexing and server_name != "pyright" and settings is None:
             per_server_settings = None
 
         try:
@@ -1138,10 +1272,10 @@ def main(argv: Optional[List[str]] = None) -> int:
                 cmd,
                 cases,
                 root,
-                trace=args.trace,
+                trace=trace,
                 settings=per_server_settings,
-                timeout_s=float(args.timeout_s),
-                warmup_s=float(args.warmup_s),
+                timeout_s=timeout_s,
+                warmup_s=warmup_s,
             )
         except Exception as e:
             batch_results = [
@@ -1151,7 +1285,13 @@ def main(argv: Optional[List[str]] = None) -> int:
                 )
                 for _ in cases
             ]
-        return server_name, batch_results
+        # Shape and validate locations here, on this server's worker thread,
+        # so the driver only has to merge finished payloads.
+        payloads = [
+            _locations_payload(res.locations, root, source_uri=case.uri)
+            for case, res in zip(cases, batch_results)
+        ]
+        return server_name, batch_results, payloads
 
     # Run all servers in parallel — each gets its own process
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(servers)) as executor:
@@ -1160,24 +1300,13 @@ def main(argv: Optional[List[str]] = None) -> int:
             for name, cmd in servers
         }
         for future in concurrent.futures.as_completed(futures):
-            server_name, batch_results = future.result()
+            server_name, batch_results, payloads = future.result()
 
-            for run_idx, (case, res) in enumerate(zip(cases, batch_results)):
+            for run_idx, (res, (locations_payload, any_valid)) in enumerate(
+                zip(batch_results, payloads)
+            ):
                 case_payload = report["cases"][run_idx]
 
-                locations_payload = [
-                    {
-                        "uri": loc.uri,
-                        "start": dataclasses.asdict(loc.range.start),
-                        "end": dataclasses.asdict(loc.range.end),
-                        "valid": _looks_like_valid_location(
-                            loc, root, source_uri=case.uri
-                        ),
-                    }
-                    for loc in res.locations
-                ]
-                any_valid = any(l.get("valid") for l in locations_payload)
-
                 case_payload["results"][server_name] = {
                     "ok": res.ok,
                     "found": res.found,
@@ -1198,15 +1327,7 @@ def main(argv: Optional[List[str]] = None) -> int:
 
                 if not locations_payload:
                     case_payload["unresolved"][server_name] = {
-                        "file": str(case.file_path),
-                        "uri": case.uri,
-                        "line": case.position.line,
-                        "character": case.position.character,
-                        "line_1b": case.position.line + 1,
-                        "character_1b": case.position.character + 1,
-                        "token": case.token,
-                        "kind": case.kind,
-                        "line_text": case.line_text,
+                        **case_meta[run_idx],
                         "reason": "no_definition_locations",
                     }
 
@@ -1215,10 +1336,11 @@ def main(argv: Optional[List[str]] = None) -> int:
         return (100.0 * n / runs) if runs else 0.0
 
     for server_name, _ in servers:
-        lats = agg[server_name]["latencies_ms"]
-        lats_sorted = sorted(lats)
-        p50 = lats_sorted[len(lats_sorted) // 2] if lats_sorted else None
-        p95 = lats_sorted[int(len(lats_sorted) * 0.95)] if lats_sorted else None
+        # One sort serves the percentiles and the min/max; no extra passes.
+        lats_sorted = sorted(agg[server_name]["latencies_ms"])
+        n_lats = len(lats_sorted)
+        p50 = lats_sorted[n_lats // 2] if n_lats else None
+        p95 = lats_sorted[int(n_lats * 0.95)] if n_lats else None
         report["summary"][server_name] = {
             "ok": agg[server_name]["ok"],
             "ok_pct": _pct(agg[server_name]["ok"]),
@@ -1228,12 +1350,12 @@ def main(argv: Optional[List[str]] = None) -> int:
             "valid_pct": _pct(agg[server_name]["valid"]),
             "errors": agg[server_name]["errors"],
             "latency_ms": {
-                "count": len(lats),
+                "count": n_lats,
                 "p50": p50,
                 "p95": p95,
-                "min": min(lats) if lats else None,
-                "max": max(lats) if lats else None,
-                "mean": (sum(lats) / len(lats)) if lats else None,
+                "min": lats_sorted[0] if n_lats else None,
+                "max": lats_sorted[-1] if n_lats else None,
+                "mean": (sum(lats_sorted) / n_lats) if n_lats else None,
             },
         }
 
@@ -1250,6 +1372,13 @@ def main(argv: Optional[List[str]] = None) -> int:
                 f"  {server_name}: ok={s['ok']}/{runs} valid={s['valid']}/{runs} errors={s['errors']} (no latency samples)"
             )
 
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    report = _run_from_args(args)
+
     if args.json_out:
         args.json_out.parent.mkdir(parents=True, exist_ok=True)
         args.json_out.write_text(json.dumps(report, indent=2), encoding="utf-8")
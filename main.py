@@ -1,7 +1,9 @@
 import argparse
 import concurrent.futures
+import heapq
 import json
 import os
+import re
 import shutil
 import sys
 import tempfile
@@ -30,25 +32,37 @@ STUB_PACKAGES = "stub_packages.json"
 
 HISTORICAL_DATA_DIR = "historical_data"
 
+# Analyses run in worker processes and are mostly CPU-bound AST work, so use
+# one process per CPU; more would only add interpreters competing for cores.
+# Each analysis also downloads a package, so keep the cap of 16.
+MAX_PARALLEL_ANALYSES = min(16, os.cpu_count() or 4)
 
-def load_and_sort_top_packages(json_file: str) -> list[dict[str, Any]]:
-    """Load the JSON file and sort it by download_count."""
-    with open(json_file, "r") as f:
+
+def load_and_sort_top_packages(
+    json_file: str, top_n: Optional[int] = None
+) -> list[dict[str, Any]]:
+    """Load the JSON file and sort it by download_count.
+
+    When top_n is given only the top_n rows are selected, which avoids
+    sorting the whole file.
+    """
+    with open(json_file, "rb") as f:
         data = json.load(f)
 
+    if top_n is not None:
+        return heapq.nlargest(top_n, data["rows"], key=lambda x: x["download_count"])
     sorted_rows = sorted(data["rows"], key=lambda x: x["download_count"], reverse=True)
     return sorted_rows
 
 
+# A path component that reads "test" or "tests" once underscores are removed
+# (e.g. "tests", "_test", "test_s").
+_TEST_DIR_RE = re.compile(r"(?:^|/)_*t_*e_*s_*t_*(?:s_*)?(?:/|$)")
+
+
 def separate_test_files(files: list[str]) -> list[str]:
     """Separate files into test files and non-test files."""
-    non_test_files: list[str] = []
-    for file in files:
-        parts = [x.replace("_", "") for x in file.split("/")]
-        if "test" in parts or "tests" in parts:
-            continue
-        non_test_files.append(file)
-    return non_test_files
+    return [file for file in files if not _TEST_DIR_RE.search(file)]
 
 
 def analyze_package(
@@ -163,10 +177,7 @@ def analyze_package(
                 skipped_files_with_stubs = skipped_files_non_tests
 
         # Add typeshed data if available
-        if typeshed_data and package_name in typeshed_data:
-            package_report["TypeshedData"] = typeshed_data[package_name]
-        else:
-            package_report["TypeshedData"] = {}
+        package_report["TypeshedData"] = (typeshed_data or {}).get(package_name, {})
 
         package_report["CoverageData"]["parameter_coverage_with_stubs"] = (
             parameter_coverage_with_stubs
@@ -190,17 +201,17 @@ def analyze_package(
     return package_report
 
 
-def get_packages_with_stubs() -> set[str]:
+def get_packages_with_stubs() -> frozenset[str]:
     with open(STUB_PACKAGES, "r") as f:
         data = json.load(f)
-    return set(data)
+    return frozenset(data)
 
 
 def analyze_package_concurrently(
     package_data: dict[str, Any],
     rank: int,
     typeshed_data: dict[str, dict[str, Any]],
-    packages_with_stubs: set[str],
+    packages_with_stubs: frozenset[str],
 ) -> tuple[str, dict[str, Any]] | None:
     package_name = package_data["project"]
     download_count = package_data["download_count"]
@@ -217,33 +228,69 @@ def analyze_package_concurrently(
     return None
 
 
+# Shared, read-only inputs for worker processes, set once by
+# _init_analysis_worker rather than pickled with every task.
+_worker_typeshed_data: dict[str, dict[str, Any]] = {}
+_worker_packages_with_stubs: frozenset[str] = frozenset()
+
+
+def _init_analysis_worker(
+    typeshed_data: dict[str, dict[str, Any]],
+    packages_with_stubs: frozenset[str],
+) -> None:
+    global _worker_typeshed_data, _worker_packages_with_stubs
+    _worker_typeshed_data = typeshed_data
+    _worker_packages_with_stubs = packages_with_stubs
+
+
+def _analyze_in_worker(
+    package_data: dict[str, Any], rank: int
+) -> tuple[str, dict[str, Any]] | None:
+    return analyze_package_concurrently(
+        package_data, rank, _worker_typeshed_data, _worker_packages_with_stubs
+    )
+
+
 def parallel_analyze_packages(
     top_packages: list[dict[str, Any]],
     typeshed_data: dict[str, dict[str, Any]],
-    packages_with_stubs: set[str],
+    packages_with_stubs: frozenset[str],
 ) -> dict[str, Any]:
-    package_report: dict[str, Any] = {}
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(
-                analyze_package_concurrently,
-                package_data,
-                rank,
-                typeshed_data,
-                packages_with_stubs,
-            ): package_data
-            for rank, package_data in enumerate(top_packages, start=1)
-        }
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result:
-                package_name, analysis_result = result
-                package_report[package_name] = analysis_result
-    sorted_pairs = sorted(
-        [pair for pair in package_report.items()], key=lambda x: x[1]["DownloadRanking"]
-    )
-    package_report = {k: v for k, v in sorted_pairs}
-    return package_report
+    # Results land in their rank's slot, so the report comes out in download
+    # ranking order without sorting it afterwards.
+    ranked_results: list[tuple[str, dict[str, Any]] | None] = [None] * len(top_packages)
+    ranked_packages = enumerate(top_packages, start=1)
+    # Coverage calculation is CPU-bound AST work, so analyze packages in
+    # separate processes instead of threads contending for the GIL.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=MAX_PARALLEL_ANALYSES,
+        initializer=_init_analysis_worker,
+        initargs=(typeshed_data, packages_with_stubs),
+    ) as executor:
+        # Keep only a window of in-flight analyses instead of queueing every
+        # package up front; submit the next one as each finishes.
+        pending: dict[concurrent.futures.Future[tuple[str, dict[str, Any]] | None], int] = {}
+
+        def submit_next() -> None:
+            next_package = next(ranked_packages, None)
+            if next_package is None:
+                return
+            rank, package_data = next_package
+            pending[executor.submit(_analyze_in_worker, package_data, rank)] = rank
+
+        for _ in range(MAX_PARALLEL_ANALYSES):
+            submit_next()
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                ranked_results[pending.pop(future) - 1] = future.result()
+                submit_next()
+    return {
+        package_name: analysis_result
+        for package_name, analysis_result in filter(None, ranked_results)
+    }
 
 
 def read_packages(file_path: str) -> list[str]:
@@ -285,7 +332,7 @@ def main(
         top_packages = [package_report[package_name]]
     else:
         # Analyze top N packages
-        sorted_packages = load_and_sort_top_packages(TOP_PYPI_PACKAGES)
+        sorted_packages = load_and_sort_top_packages(TOP_PYPI_PACKAGES, top_n)
         top_packages = sorted_packages[:top_n]
 
         if package_list:
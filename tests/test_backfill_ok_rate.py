@@ -6,6 +6,8 @@ import json
 from pathlib import Path
 from typing import Any
 
+import pytest
+
 # Import the module under test
 import sys
 
@@ -17,172 +19,79 @@ from lsp.benchmark.backfill_ok_rate import (
 )
 
 
-class TestCalculateOkRateFromResults:
-    """Tests for calculate_ok_rate_from_results function."""
-
-    def test_calculate_with_all_successful(self) -> None:
-        """Test calculating ok_rate when all requests succeed."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 10,
-                    }
-                },
-            },
-        ]
-
-        ok_rates = calculate_ok_rate_from_results(results, ["pyright"])
-
-        assert ok_rates["pyright"] == 100.0
-
-    def test_calculate_with_some_timeouts(self) -> None:
-        """Test calculating ok_rate when some requests timeout."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 8,  # 2 timeouts
-                    }
-                },
-            },
-        ]
-
-        ok_rates = calculate_ok_rate_from_results(results, ["pyright"])
-
-        assert ok_rates["pyright"] == 80.0
-
-    def test_calculate_with_multiple_packages(self) -> None:
-        """Test calculating ok_rate across multiple packages."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 10,
-                    }
-                },
-            },
-            {
-                "package_name": "pkg2",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 6,  # 4 timeouts
-                    }
-                },
-            },
-        ]
-
-        ok_rates = calculate_ok_rate_from_results(results, ["pyright"])
-
-        # Total: 16 ok out of 20 runs = 80%
-        assert ok_rates["pyright"] == 80.0
-
-    def test_calculate_with_multiple_checkers(self) -> None:
-        """Test calculating ok_rate for multiple type checkers."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 10,
-                    },
-                    "pyrefly": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 9,
-                    },
-                },
-            },
-        ]
-
-        ok_rates = calculate_ok_rate_from_results(
-            results, ["pyright", "pyrefly"]
-        )
-
-        assert ok_rates["pyright"] == 100.0
-        assert ok_rates["pyrefly"] == 90.0
-
-    def test_calculate_with_package_errors(self) -> None:
-        """Test that packages with errors are excluded."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": "Failed to clone",
-                "metrics": {},
-            },
-            {
-                "package_name": "pkg2",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 10,
-                    }
-                },
-            },
-        ]
+def _package(
+    name: str, error: str | None = None, **checkers: tuple[bool, int]
+) -> dict[str, Any]:
+    """Build a package result with 10 runs per checker and the given ok counts."""
+    return {
+        "package_name": name,
+        "error": error,
+        "metrics": {
+            checker: {"ok": ok, "runs": 10, "ok_count": ok_count}
+            for checker, (ok, ok_count) in checkers.items()
+        },
+    }
 
-        ok_rates = calculate_ok_rate_from_results(results, ["pyright"])
 
-        # Only pkg2 should be counted
-        assert ok_rates["pyright"] == 100.0
-
-    def test_calculate_with_checker_not_ok(self) -> None:
-        """Test that metrics with ok=False are excluded."""
-        results: list[dict[str, Any]] = [
-            {
-                "package_name": "pkg1",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": False,
-                        "runs": 10,
-                        "ok_count": 0,
-                    }
-                },
-            },
-            {
-                "package_name": "pkg2",
-                "error": None,
-                "metrics": {
-                    "pyright": {
-                        "ok": True,
-                        "runs": 10,
-                        "ok_count": 10,
-                    }
-                },
-            },
-        ]
-
-        ok_rates = calculate_ok_rate_from_results(results, ["pyright"])
-
-        # Only pkg2 should be counted
-        assert ok_rates["pyright"] == 100.0
+class TestCalculateOkRateFromResults:
+    """Tests for calculate_ok_rate_from_results function."""
 
-    def test_calculate_with_no_results(self) -> None:
-        """Test calculating ok_rate with no results."""
-        ok_rates = calculate_ok_rate_from_results([], ["pyright"])
+    @pytest.mark.parametrize(
+        "results,type_checkers,expected",
+        [
+            pytest.param(
+                [_package("pkg1", pyright=(True, 10))],
+                ["pyright"],
+                {"pyright": 100.0},
+                id="all_successful",
+            ),
+            pytest.param(
+                [_package("pkg1", pyright=(True, 8))],  # 2 timeouts
+                ["pyright"],
+                {"pyright": 80.0},
+                id="some_timeouts",
+            ),
+            pytest.param(
+                # Total: 16 ok out of 20 runs = 80%
+                [_package("pkg1", pyright=(True, 10)), _package("pkg2", pyright=(True, 6))],
+                ["pyright"],
+                {"pyright": 80.0},
+                id="multiple_packages",
+            ),
+            pytest.param(
+                [_package("pkg1", pyright=(True, 10), pyrefly=(True, 9))],
+                ["pyright", "pyrefly"],
+                {"pyright": 100.0, "pyrefly": 90.0},
+                id="multiple_checkers",
+            ),
+            pytest.param(
+                # Only pkg2 should be counted
+                [_package("pkg1", error="Failed to clone"), _package("pkg2", pyright=(True, 10))],
+                ["pyright"],
+                {"pyright": 100.0},
+                id="package_errors_excluded",
+            ),
+            pytest.param(
+                # Only pkg2 should be counted
+                [_package("pkg1", pyright=(False, 0)), _package("pkg2", pyright=(True, 10))],
+                ["pyright"],
+                {"pyright": 100.0},
+                id="checker_not_ok_excluded",
+            ),
+            pytest.param([], ["pyright"], {"pyright": 0.0}, id="no_results"),
+        ],
+    )
+    def test_calculate_ok_rate(
+        self,
+        results: list[dict[str, Any]],
+        type_checkers: list[str],
+        expected: dict[str, float],
+    ) -> None:
+        """Test ok_rate calculation across packages and type checkers."""
+        ok_rates = calculate_ok_rate_from_results(results, type_checkers)
 
-        assert ok_rates["pyright"] == 0.0
+        for checker, ok_rate in expected.items():
+            assert ok_rates[checker] == ok_rate
 
 
 class TestBackfillFile:
@@ -254,6 +163,48 @@ class TestBackfillFile:
         updated_data = json.loads(test_file.read_text())
         assert updated_data["aggregate"]["pyright"]["ok_rate"] == 95.0
 
+    def test_backfill_skips_if_no_aggregate(self, tmp_path: Path) -> None:
+        """Test that backfill leaves files without aggregate stats untouched."""
+        test_file = tmp_path / "benchmark.json"
+        original_json = json.dumps(
+            {"type_checkers": ["pyright"], "aggregate": {}, "results": []}
+        )
+        test_file.write_text(original_json)
+
+        result = backfill_file(test_file)
+
+        assert result is False
+        assert test_file.read_text() == original_json
+
+    @pytest.mark.parametrize(
+        "type_checkers,results",
+        [
+            pytest.param([], [_package("pkg1", pyright=(True, 10))], id="no_type_checkers"),
+            pytest.param(["pyright"], [], id="no_results"),
+        ],
+    )
+    def test_backfill_skips_if_no_checkers_or_results(
+        self,
+        tmp_path: Path,
+        type_checkers: list[str],
+        results: list[dict[str, Any]],
+    ) -> None:
+        """Test that backfill leaves files without checkers or results untouched."""
+        test_file = tmp_path / "benchmark.json"
+        original_json = json.dumps(
+            {
+                "type_checkers": type_checkers,
+                "aggregate": {"pyright": {"packages_tested": 1}},
+                "results": results,
+            }
+        )
+        test_file.write_text(original_json)
+
+        result = backfill_file(test_file)
+
+        assert result is False
+        assert test_file.read_text() == original_json
+
     def test_backfill_multiple_checkers(self, tmp_path: Path) -> None:
         """Test backfilling ok_rate for multiple type checkers."""
         test_file = tmp_path / "benchmark.json"
@@ -67,41 +67,27 @@ def test_calculate_overall_coverage_with_stubs():
     assert coverage_data["skipped_files"] == 0
 
 
-def test_fully_annotated_with_stubs():
-    files = ["tests/test_files/fully_annotated.py"]
-    coverage_data = calculate_overall_coverage(files)
-
-    assert coverage_data["parameter_coverage"] == 100.0
-    assert coverage_data["return_type_coverage"] == 100.0
-    assert coverage_data["skipped_files"] == 0
-
-
-def test_partially_annotated_with_stubs():
-    files = ["tests/test_files/partially_annotated.py"]
-    coverage_data = calculate_overall_coverage(files)
-
-    assert coverage_data["parameter_coverage"] == pytest.approx(  # type: ignore[reportUnknownMemberType]
-        33.33, rel=1e-2)
-    assert coverage_data["return_type_coverage"] == pytest.approx(  # type: ignore[reportUnknownMemberType]
-        66.67, rel=1e-2)
-    assert coverage_data["skipped_files"] == 0
-
-
-def test_complex_types_with_stubs():
-    files = ["tests/test_files/complex_types.py"]
-    coverage_data = calculate_overall_coverage(files)
-
-    assert coverage_data["parameter_coverage"] == 100.0
-    assert coverage_data["return_type_coverage"] == 100.0
-    assert coverage_data["skipped_files"] == 0
-
-
-def test_class_methods_with_stubs():
-    files = ["tests/test_files/class_methods.py"]
+@pytest.mark.parametrize(
+    "file_name,parameter_coverage,return_type_coverage",
+    [
+        ("fully_annotated.py", 100.0, 100.0),
+        (
+            "partially_annotated.py",
+            pytest.approx(33.33, rel=1e-2),  # type: ignore[reportUnknownMemberType]
+            pytest.approx(66.67, rel=1e-2),  # type: ignore[reportUnknownMemberType]
+        ),
+        ("complex_types.py", 100.0, 100.0),
+        ("class_methods.py", 100.0, 100.0),
+    ],
+)
+def test_single_file_coverage_with_stubs(
+    file_name: str, parameter_coverage: float, return_type_coverage: float
+) -> None:
+    files = [f"tests/test_files/{file_name}"]
     coverage_data = calculate_overall_coverage(files)
 
-    assert coverage_data["parameter_coverage"] == 100.0
-    assert coverage_data["return_type_coverage"] == 100.0
+    assert coverage_data["parameter_coverage"] == parameter_coverage
+    assert coverage_data["return_type_coverage"] == return_type_coverage
     assert coverage_data["skipped_files"] == 0
 
 
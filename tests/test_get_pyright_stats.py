@@ -1,7 +1,8 @@
+import io
 import os
 import json
 from pathlib import Path
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 
 from coverage_sources.get_pyright_stats import (
     create_output_directory,
@@ -16,7 +17,7 @@ from coverage_sources.get_pyright_stats import (
 def test_create_output_directory(tmp_path: Path) -> None:
     output_dir: Path = tmp_path / ".pyright_output"
     create_output_directory(str(output_dir))
-    assert os.path.exists(output_dir)
+    assert output_dir.is_dir()
 
 
 def test_create_virtual_environment() -> None:
@@ -43,7 +44,7 @@ def test_activate_and_install_package() -> None:
 def test_create_py_typed_file(tmp_path: Path) -> None:
     py_typed_path: Path = tmp_path / "lib/python3.12/site-packages/test_package/py.typed"
     create_py_typed_file(str(py_typed_path))
-    assert os.path.exists(py_typed_path)
+    assert py_typed_path.is_file()
 
 
 def test_run_pyright() -> None:
@@ -67,13 +68,42 @@ def test_parse_output_json() -> None:
             "completenessScore": 0.5,
         }
     }
-    with patch("builtins.open", mock_open(read_data=json.dumps(mock_data))):
+    with patch("builtins.open", return_value=io.BytesIO(json.dumps(mock_data).encode())):
         result = parse_output_json(output_file)
         assert result["total"] == 10
         assert result["withAnnotations"] == 5
         assert result["coverage"] == 50.0
 
 
+def test_parse_output_json_with_exclude_like(tmp_path: Path) -> None:
+    output_file: Path = tmp_path / "test_output.json"
+    mock_data = {
+        "typeCompleteness": {
+            "exportedSymbolCounts": {"total": 5, "withAnnotations": 2},
+            "completenessScore": 0.4,
+            "symbols": [
+                {"name": "pkg.a", "isExported": True, "isTypeKnown": True},
+                {"name": "pkg.b", "isExported": True, "isTypeKnown": False},
+                {"name": "pkg.private", "isExported": False, "isTypeKnown": False},
+                {"name": "pkg.tests.t", "isExported": True, "isTypeKnown": False},
+                {
+                    "name": "pkg.core.C",
+                    "alternateNames": ["pkg.api.C"],
+                    "isExported": True,
+                    "isTypeKnown": True,
+                },
+            ],
+        }
+    }
+    output_file.write_text(json.dumps(mock_data))
+
+    result = parse_output_json(str(output_file), ["*.tests.*", "pkg.core.*"])
+
+    # pkg.a, pkg.b and pkg.core.C (via its alternate name) are kept
+    assert result["coverage"] == 2 / 3 * 100
+    assert result["total"] == 5
+
+
 def test_main(tmp_path: Path) -> None:
     packages = [{"package_name": "test_package", "has_py_typed": False}]
     output_dir: Path = tmp_path / ".pyright_output"
@@ -95,7 +125,7 @@ def test_main(tmp_path: Path) -> None:
          patch("coverage_sources.get_pyright_stats.create_py_typed_file") as mock_create_py_typed, \
          patch("coverage_sources.get_pyright_stats.run_pyright") as mock_run_pyright, \
          patch("coverage_sources.get_pyright_stats.parse_output_json", return_value={"total": 10, "withAnnotations": 5, "coverage": 50.0}) as mock_parse_json, \
-         patch("subprocess.run") as mock_subprocess_run:
+         patch("coverage_sources.get_pyright_stats.shutil.rmtree") as mock_rmtree:
 
         stats = main(packages)
         assert stats["test_package"]["total"] == 10
@@ -108,4 +138,4 @@ def test_main(tmp_path: Path) -> None:
         mock_create_py_typed.assert_called_once_with(expected_py_typed)
         mock_run_pyright.assert_called_once_with(expected_venv, "test_package", expected_output_file)
         mock_parse_json.assert_called_once_with(expected_output_file, None)
-        mock_subprocess_run.assert_called()
+        mock_rmtree.assert_called_once_with(".pyright_env_test_package", ignore_errors=True)
@@ -2,14 +2,31 @@
 
 from __future__ import annotations
 
+import json
+import os
+import random
+import textwrap
 from pathlib import Path
 from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from lsp.lsp_benchmark import (
+    BenchmarkCase,
+    DefinitionResult,
+    LspClient,
+    main,
+    run,
+    _case_meta,
+    _collect_ast_occurrences,
+    _discover_py_files,
+    _token_from_line_at,
+    pick_random_identifier_case,
     _parse_definition_result,
     _looks_like_valid_location,
     Location,
@@ -294,3 +311,411 @@ class TestMultipleLocationsNotCountedAsFailure:
 
         assert len(locations) == 1
         assert len(locations) > 0  # Not unresolved
+
+
+class TestCollectAstOccurrences:
+    """Tests for _collect_ast_occurrences."""
+
+    def test_kinds_and_banned_names(self) -> None:
+        """Test occurrence kinds, including imports that follow their use."""
+        src = textwrap.dedent(
+            """
+            def f(x):
+                return os.path.join(helper(x), str(x))
+
+            import os
+            from util import helper
+            """
+        )
+
+        occ = {(o.token, o.kind) for o in _collect_ast_occurrences(src)}
+
+        assert ("join", "attr_call") in occ
+        assert ("path", "imported_attr") in occ
+        assert ("helper", "imported_call") in occ
+        assert ("helper", "imported_name") in occ
+        assert ("x", "name") in occ
+        assert not any(token == "str" for token, _ in occ)
+
+    def test_syntax_error_returns_empty(self) -> None:
+        """Test unparsable source yields no occurrences."""
+        assert _collect_ast_occurrences("def broken(:\n") == []
+
+
+class TestIdentifierPositions:
+    """Tests for token extraction and case positions."""
+
+    def test_token_must_start_at_column(self) -> None:
+        """Test only identifiers starting exactly at the column are returned."""
+        lines = ["result = compute(value)"]
+
+        assert _token_from_line_at(lines, 1, 9) == "compute"
+        assert _token_from_line_at(lines, 1, 11) is None
+        assert _token_from_line_at(lines, 1, 6) is None
+
+    def test_repeated_name_keeps_its_own_column(self, tmp_path: Path) -> None:
+        """Test a repeated name is not moved to its first occurrence on the line."""
+        f = tmp_path / "mod.py"
+        f.write_text("a = b + a\n")
+
+        columns = {
+            pick_random_identifier_case(f, rng=random.Random(seed)).position.character
+            for seed in range(50)
+        }
+
+        assert columns == {0, 4, 8}
+
+    def test_non_ascii_prefix_uses_character_columns(self, tmp_path: Path) -> None:
+        """Test ast byte offsets are converted to character columns."""
+        f = tmp_path / "mod.py"
+        f.write_text(
+            'import os\nx = "h\u00e9llo w\u00f6rld"; y = os.path.join(x)\n',
+            encoding="utf-8",
+        )
+
+        cases = [
+            pick_random_identifier_case(f, rng=random.Random(seed))
+            for seed in range(50)
+        ]
+
+        for case in cases:
+            start = case.position.character
+            assert case.line_text[start:start + len(case.token)] == case.token
+        assert any(
+            c.position.line == 1 and c.token == "os" and c.position.character == 23
+            for c in cases
+        )
+
+    def test_case_carries_source_text(self, tmp_path: Path) -> None:
+        """Test the picked case keeps the file text for didOpen."""
+        f = tmp_path / "mod.py"
+        f.write_text("import os\nos.getcwd()\n")
+
+        case = pick_random_identifier_case(f, rng=random.Random(0))
+
+        assert case.source_text == "import os\nos.getcwd()\n"
+
+    def test_source_parsed_once_until_file_changes(self, tmp_path: Path) -> None:
+        """Test repeated picks reuse the parse until the file is modified."""
+        f = tmp_path / "mod.py"
+        f.write_text("import os\nos.getcwd()\n")
+
+        with patch(
+            "lsp.lsp_benchmark._collect_ast_occurrences",
+            wraps=_collect_ast_occurrences,
+        ) as mock_collect:
+            for seed in range(3):
+                pick_random_identifier_case(f, rng=random.Random(seed))
+            assert mock_collect.call_count == 1
+
+            f.write_text("import sys\nsys.exit()\n# changed\n")
+            case = pick_random_identifier_case(f, rng=random.Random(0))
+            assert mock_collect.call_count == 2
+
+        assert case.token in {"sys", "exit"}
+
+
+class TestDiscoverPyFiles:
+    """Tests for _discover_py_files."""
+
+    def test_skips_excluded_directories(self, tmp_path: Path) -> None:
+        """Test excluded folders (any case) are pruned from the scan."""
+        for rel in [
+            "pkg/mod.py",
+            "pkg/sub/deep.py",
+            "pkg/notes.txt",
+            ".venv/lib/site.py",
+            "Build/gen.py",
+            "node_modules/x/y.py",
+        ]:
+            f = tmp_path / rel
+            f.parent.mkdir(parents=True, exist_ok=True)
+            f.write_text("x = 1\n")
+
+        files = _discover_py_files(tmp_path)
+
+        assert files == (
+            tmp_path / "pkg" / "mod.py",
+            tmp_path / "pkg" / "sub" / "deep.py",
+        )
+
+
+    def test_run_rescans_changed_tree(self, tmp_path: Path) -> None:
+        """Test run() does not pick files from an earlier, stale scan."""
+        root = tmp_path.resolve()
+        (root / "old.py").write_text("import os\n")
+        assert _discover_py_files(root) == (root / "old.py",)
+        (root / "old.py").unlink()
+        (root / "new.py").write_text("import sys\n")
+
+        with patch("lsp.lsp_benchmark.run_server_batch", side_effect=RuntimeError("no server")):
+            report = run(root=root, servers=[("ty", "ty server")], runs=1, seed=0)
+
+        assert report["cases"][0]["picked"]["file"].endswith("new.py")
+
+
+class TestCaseMeta:
+    """Tests for the picked/unresolved case metadata builder."""
+
+    def test_case_meta_fields(self, tmp_path: Path) -> None:
+        """Test positions are reported both 0-based and 1-based."""
+        case = BenchmarkCase(
+            file_path=tmp_path / "m.py",
+            uri="file:///m.py",
+            position=Position(line=4, character=2),
+            token="foo",
+            line_text="  foo()",
+            kind="call",
+            source_text="ignored",
+        )
+
+        meta = _case_meta(case)
+
+        assert meta == {
+            "file": str(tmp_path / "m.py"),
+            "uri": "file:///m.py",
+            "line": 4,
+            "character": 2,
+            "line_1b": 5,
+            "character_1b": 3,
+            "token": "foo",
+            "kind": "call",
+            "line_text": "  foo()",
+        }
+
+
+class TestMainArgsToRun:
+    """Tests that main() forwards parsed arguments to the typed run() API."""
+
+    def test_servers_and_options_forwarded(self, tmp_path: Path) -> None:
+        """Test that CLI flags become run() keyword arguments."""
+        with patch("lsp.lsp_benchmark.run", return_value={}) as mock_run:
+            rc = main([
+                "--root", str(tmp_path),
+                "--servers", "pyright,pyrefly",
+                "--pyrefly-cmd", "pyrefly lsp",
+                "--pyright-cmd", "pyright-langserver --stdio",
+                "--runs", "3",
+                "--seed", "7",
+                "--pyright-disable-indexing",
+            ])
+
+        assert rc == 0
+        kwargs = mock_run.call_args.kwargs
+        assert kwargs["servers"] == [
+            ("pyrefly", "pyrefly lsp"),
+            ("pyright", "pyright-langserver --stdio"),
+        ]
+        assert kwargs["runs"] == 3
+        assert kwargs["seed"] == 7
+        assert kwargs["settings"] is None
+        assert kwargs["pyright_disable_indexing"] is True
+
+
+class TestRunSummary:
+    """Tests for the per-server summary computed by run()."""
+
+    def test_latency_summary(self, tmp_path: Path) -> None:
+        """Test percentiles, min/max/mean and counts over a batch."""
+        target = tmp_path / "m.py"
+        target.write_text("foo = 1\n")
+        case = BenchmarkCase(
+            file_path=target,
+            uri=target.as_uri(),
+            position=Position(line=0, character=0),
+            token="foo",
+            line_text="foo = 1",
+        )
+        loc = Location(
+            uri=target.as_uri(),
+            range=Range(Position(0, 0), Position(0, 3)),
+        )
+        latencies = [40.0, 10.0, 30.0, 20.0, None]
+        batch = [
+            DefinitionResult(
+                ok=lat is not None, found=lat is not None,
+                n_locations=1 if lat is not None else 0,
+                latency_ms=lat, error=None if lat is not None else "timeout",
+                raw_result=None, locations=[loc] if lat is not None else [],
+            )
+            for lat in latencies
+        ]
+
+        with patch("lsp.lsp_benchmark.pick_random_case", return_value=case), \
+                patch("lsp.lsp_benchmark.run_server_batch", return_value=batch):
+            report = run(root=tmp_path, servers=[("ty", "ty server")], runs=5)
+
+        summary = report["summary"]["ty"]
+        assert summary["ok"] == 4
+        assert summary["valid"] == 4
+        assert summary["latency_ms"] == {
+            "count": 4,
+            "p50": 30.0,
+            "p95": 40.0,
+            "min": 10.0,
+            "max": 40.0,
+            "mean": 25.0,
+        }
+        assert report["cases"][0]["results"]["ty"]["locations"] == [{
+            "uri": target.as_uri(),
+            "start": {"line": 0, "character": 0},
+            "end": {"line": 0, "character": 3},
+            "valid": True,
+        }]
+        assert "ty" not in report["cases"][0]["unresolved"]
+        assert report["cases"][4]["unresolved"]["ty"]["reason"] == (
+            "no_definition_locations"
+        )
+
+
+class TestLspClientFraming:
+    """Tests for LspClient's Content-Length framed reader."""
+
+    def test_reads_multiple_and_large_messages(self, tmp_path: Path) -> None:
+        """Test messages are split correctly regardless of read chunking."""
+        server = tmp_path / "fake_server.py"
+        server.write_text(textwrap.dedent(
+            """
+            import json, sys
+            out = sys.stdout.buffer
+            msgs = [
+                {"jsonrpc": "2.0", "method": "first"},
+                {"jsonrpc": "2.0", "method": "big", "params": "x" * 200000},
+                {"jsonrpc": "2.0", "method": "last"},
+            ]
+            for m in msgs:
+                body = json.dumps(m).encode()
+                out.write(b"Content-Type: application/vscode-jsonrpc\\r\\n")
+                out.write(b"Content-Length: %d\\r\\n\\r\\n" % len(body))
+                out.write(body)
+            bad = b'{"jsonrpc": "2.0", "method": "bad\\xff"}'
+            out.write(b"Content-Length: %d\\r\\n\\r\\n" % len(bad) + bad)
+            out.flush()
+            """
+        ))
+
+        client = LspClient("fake", [sys.executable, str(server)], tmp_path)
+        client.start()
+        try:
+            received = [client._rx_queue.get(timeout=10) for _ in range(4)]
+        finally:
+            client._shutdown = True
+            client.stop()
+
+        assert [m["method"] for m in received] == ["first", "big", "last", "bad\ufffd"]
+        assert len(received[1]["params"]) == 200000
+
+    def test_accepts_lf_only_headers(self, tmp_path: Path) -> None:
+        """Test header blocks ending in bare LF lines are framed like CRLF ones."""
+        server = tmp_path / "fake_server.py"
+        server.write_text(textwrap.dedent(
+            """
+            import json, sys
+            out = sys.stdout.buffer
+            for name, eol in [("lf", b"\\n"), ("crlf", b"\\r\\n"), ("mixed", b"\\n")]:
+                body = json.dumps({"jsonrpc": "2.0", "method": name}).encode()
+                blank = b"\\r\\n" if name == "mixed" else eol
+                out.write(b"Content-Length: %d" % len(body) + eol + blank + body)
+            out.flush()
+            """
+        ))
+
+        client = LspClient("fake", [sys.executable, str(server)], tmp_path)
+        client.start()
+        try:
+            received = [client._rx_queue.get(timeout=10) for _ in range(3)]
+        finally:
+            client._shutdown = True
+            client.stop()
+
+        assert [m["method"] for m in received] == ["lf", "crlf", "mixed"]
+
+    def test_send_writes_whole_message_once(self, tmp_path: Path) -> None:
+        """Test header and body go out together, retrying partial writes."""
+        client = LspClient("fake", ["unused"], tmp_path)
+        chunks: list[bytes] = []
+
+        def partial_write(data: memoryview) -> int:
+            n = min(len(data), 10)
+            chunks.append(bytes(data[:n]))
+            return n
+
+        client._proc = MagicMock()
+        client._proc.stdin.write.side_effect = partial_write
+
+        with patch("lsp.lsp_benchmark._HAS_WRITEV", False):
+            client.notify("initialized", {})
+
+        sent = b"".join(chunks)
+        header, body = sent.split(b"\r\n\r\n", 1)
+        assert header == b"Content-Length: %d" % len(body)
+        assert json.loads(body) == {"jsonrpc": "2.0", "method": "initialized", "params": {}}
+
+    @pytest.mark.skipif(not hasattr(os, "writev"), reason="requires os.writev")
+    def test_send_writev_handles_partial_writes(self, tmp_path: Path) -> None:
+        """Test the writev path resumes mid-buffer after a short write."""
+        client = LspClient("fake", ["unused"], tmp_path)
+        chunks: list[bytes] = []
+
+        def partial_writev(fd: int, bufs: list[memoryview]) -> int:
+            data = b"".join(bytes(b) for b in bufs)[:7]
+            chunks.append(data)
+            return len(data)
+
+        client._proc = MagicMock()
+        client._proc.stdin.fileno.return_value = 99
+
+        with patch("lsp.lsp_benchmark.os.writev", side_effect=partial_writev):
+            client.notify("initialized", {"x": 1})
+
+        sent = b"".join(chunks)
+        header, body = sent.split(b"\r\n\r\n", 1)
+        assert header == b"Content-Length: %d" % len(body)
+        assert json.loads(body) == {"jsonrpc": "2.0", "method": "initialized", "params": {"x": 1}}
+        client._proc.stdin.write.assert_not_called()
+
+    def test_stderr_tail_is_bounded(self, tmp_path: Path) -> None:
+        """Test the stderr tail keeps only the most recent lines."""
+        client = LspClient("fake", ["unused"], tmp_path)
+        for i in range(250):
+            client._stderr_tail.append(f"line {i}")
+
+        tail = client._stderr_tail_text(max_lines=3)
+
+        assert tail == "line 247\nline 248\nline 249"
+        assert len(client._stderr_tail) == 200
+
+    def test_request_round_trip_and_timeout(self, tmp_path: Path) -> None:
+        """Test responses reach their waiter and unanswered requests time out."""
+        server = tmp_path / "echo_server.py"
+        server.write_text(textwrap.dedent(
+            """
+            import json, sys
+            inp, out = sys.stdin.buffer, sys.stdout.buffer
+            while True:
+                header = inp.readline()
+                if not header:
+                    break
+                length = int(header.split(b":")[1])
+                inp.readline()
+                msg = json.loads(inp.read(length))
+                if msg.get("method") != "echo":
+                    continue
+                body = json.dumps({"jsonrpc": "2.0", "id": msg["id"], "result": msg["params"]}).encode()
+                out.write(b"Content-Length: %d\\r\\n\\r\\n" % len(body) + body)
+                out.flush()
+            """
+        ))
+
+        client = LspClient("echo", [sys.executable, str(server)], tmp_path)
+        client.start()
+        try:
+            resp = client.request("echo", {"x": 1}, timeout_s=10)
+            with pytest.raises(TimeoutError):
+                client.request("ignored", {}, timeout_s=0.2)
+        finally:
+            client._shutdown = True
+            client.stop()
+
+        assert resp["result"] == {"x": 1}
+        assert client._pending == {}
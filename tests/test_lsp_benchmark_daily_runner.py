@@ -7,6 +7,8 @@ from pathlib import Path
 from typing import Any
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 # Import the module under test
 import sys
 
@@ -18,9 +20,12 @@ from lsp.benchmark.daily_runner import (
     compute_aggregate_stats,
     fetch_github_package,
     find_type_checker_command,
+    get_or_update_repo,
     load_packages_from_install_envs,
     parse_args,
     _parse_benchmark_results,
+    _run_all_benchmarks,
+    _run_checkers_together,
     _save_results,
 )
 
@@ -105,6 +110,7 @@ class TestLoadPackagesFromInstallEnvs:
             result = load_packages_from_install_envs(limit=2)
 
         assert len(result) == 2
+        assert [p["ranking"] for p in result] == [1, 2]
 
     def test_load_with_package_names_filter(self, tmp_path: Path) -> None:
         """Test loading specific packages by name."""
@@ -199,13 +205,197 @@ class TestFetchGithubPackage:
             assert result is None
 
 
+class TestGetOrUpdateRepo:
+    """Tests for get_or_update_repo function."""
+
+    def test_cache_miss_clones(self, tmp_path: Path) -> None:
+        """Test that a missing cache entry falls back to a fresh clone."""
+        with patch("lsp.benchmark.daily_runner.fetch_github_package") as mock_fetch:
+            mock_fetch.return_value = tmp_path / "repo"
+
+            result = get_or_update_repo("https://github.com/test/repo", "repo", tmp_path)
+
+        assert result == tmp_path / "repo"
+        mock_fetch.assert_called_once_with(
+            "https://github.com/test/repo", "repo", tmp_path, 180, log=print
+        )
+
+    def test_cache_hit_skips_fetch_when_head_unchanged(self, tmp_path: Path) -> None:
+        """Test that an up-to-date cached clone is reused without fetching."""
+        (tmp_path / "repo" / ".git").mkdir(parents=True)
+        sha = "a" * 40
+
+        def fake_run(argv: list[str], **kwargs: Any) -> MagicMock:
+            stdout = {"ls-remote": f"{sha}\tHEAD\n", "rev-parse": f"{sha}\n"}.get(argv[1], "")
+            return MagicMock(returncode=0, stdout=stdout, stderr="")
+
+        with patch("subprocess.run", side_effect=fake_run) as mock_run:
+            result = get_or_update_repo("https://github.com/test/repo", "repo", tmp_path)
+
+        assert result == tmp_path / "repo"
+        git_commands = [call.args[0][1] for call in mock_run.call_args_list]
+        assert "fetch" not in git_commands
+        assert "clean" in git_commands
+
+
+def _packages(*names: str) -> list[Any]:
+    """Build ranked package entries with a GitHub URL for each name."""
+    return [
+        {"name": name, "github_url": f"https://github.com/t/{name}", "download_count": 0, "ranking": i}
+        for i, name in enumerate(names, 1)
+    ]
+
+
+def _fake_benchmark(
+    package: Any, github_url: Any, package_path: Any, *args: Any, **kwargs: Any
+) -> Any:
+    """Stand in for _benchmark_single_package without running any servers."""
+    return {
+        "package_name": package["name"],
+        "github_url": github_url,
+        "ranking": package["ranking"],
+        "error": None if package_path else "Failed to clone repository",
+        "metrics": {},
+    }
+
+
+class TestRunAllBenchmarks:
+    """Tests for _run_all_benchmarks function."""
+
+    def test_results_keep_package_order(self, tmp_path: Path) -> None:
+        """Test that results follow package order, not clone completion order."""
+        packages = _packages("a", "b", "c", "d", "e")
+
+        with patch(
+            "lsp.benchmark.daily_runner.fetch_github_package",
+            side_effect=lambda url, name, temp_dir, **kwargs: None if name == "c" else temp_dir / name,
+        ), patch(
+            "lsp.benchmark.daily_runner._benchmark_single_package",
+            side_effect=_fake_benchmark,
+        ):
+            results = _run_all_benchmarks(packages, ["pyright"], 1, None)
+
+        assert [r["package_name"] for r in results] == ["a", "b", "c", "d", "e"]
+        assert results[2]["error"] == "Failed to clone repository"
+
+    def test_clone_exception_becomes_package_error(self) -> None:
+        """Test that a clone raising an exception does not abort the run."""
+        packages = _packages("a", "b", "c")
+
+        def fake_fetch(url: str, name: str, temp_dir: Path, **kwargs: Any) -> Path:
+            if name == "b":
+                raise PermissionError("cache not writable")
+            return temp_dir / name
+
+        with patch(
+            "lsp.benchmark.daily_runner.fetch_github_package",
+            side_effect=fake_fetch,
+        ), patch(
+            "lsp.benchmark.daily_runner.run_benchmark_for_package",
+            return_value={},
+        ):
+            results = _run_all_benchmarks(packages, ["pyright"], 1, None)
+
+        assert [r["package_name"] for r in results] == ["a", "b", "c"]
+        assert results[1]["error"] == "Failed to clone repository"
+        assert results[0]["error"] is None
+        assert results[2]["error"] is None
+
+    def test_clone_messages_follow_package_header(
+        self, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """Test that clone output is printed under its own package header."""
+        packages = _packages("a", "b")
+
+        def fake_fetch(url: str, name: str, temp_dir: Path, **kwargs: Any) -> Path:
+            kwargs["log"](f"  Cloning {name}")
+            return temp_dir / name
+
+        with patch(
+            "lsp.benchmark.daily_runner.fetch_github_package",
+            side_effect=fake_fetch,
+        ), patch(
+            "lsp.benchmark.daily_runner._benchmark_single_package",
+            side_effect=_fake_benchmark,
+        ):
+            _run_all_benchmarks(packages, ["pyright"], 1, None)
+
+        lines = [line for line in capsys.readouterr().out.splitlines() if line]
+        assert lines == [
+            "[1/2] Processing a",
+            "  Cloning a",
+            "[2/2] Processing b",
+            "  Cloning b",
+        ]
+
+    def test_no_temp_dir_with_repo_cache(self, tmp_path: Path) -> None:
+        """Test that cached clones do not create an unused temp directory."""
+        packages = _packages("a")
+
+        with patch(
+            "lsp.benchmark.daily_runner.tempfile.TemporaryDirectory"
+        ) as mock_temp_dir, patch(
+            "lsp.benchmark.daily_runner.get_or_update_repo",
+            side_effect=lambda url, name, cache_dir, **kwargs: cache_dir / name,
+        ), patch(
+            "lsp.benchmark.daily_runner._benchmark_single_package",
+            side_effect=_fake_benchmark,
+        ):
+            _run_all_benchmarks(packages, ["pyright"], 1, None, repo_cache=tmp_path)
+
+        mock_temp_dir.assert_not_called()
+
+    def test_results_written_to_progress_file(self, tmp_path: Path) -> None:
+        """Test that each finished package is appended to the progress file."""
+        packages = _packages("a", "b")
+        progress_file = tmp_path / "progress.jsonl"
+
+        with patch(
+            "lsp.benchmark.daily_runner.fetch_github_package",
+            side_effect=lambda url, name, temp_dir, **kwargs: temp_dir / name,
+        ), patch(
+            "lsp.benchmark.daily_runner._benchmark_single_package",
+            side_effect=_fake_benchmark,
+        ):
+            _run_all_benchmarks(
+                packages, ["pyright"], 1, None, progress_file=progress_file
+            )
+
+        lines = progress_file.read_text().splitlines()
+        assert sorted(json.loads(line)["package_name"] for line in lines) == ["a", "b"]
+
+    def test_progress_file_truncated_on_rerun(self, tmp_path: Path) -> None:
+        """Test that a re-run does not keep lines from an earlier run."""
+        packages = _packages("a")
+        progress_file = tmp_path / "progress.jsonl"
+        progress_file.write_text('{"package_name": "stale"}\n')
+
+        with patch(
+            "lsp.benchmark.daily_runner.fetch_github_package",
+            side_effect=lambda url, name, temp_dir, **kwargs: temp_dir / name,
+        ), patch(
+            "lsp.benchmark.daily_runner._benchmark_single_package",
+            side_effect=_fake_benchmark,
+        ):
+            _run_all_benchmarks(
+                packages, ["pyright"], 1, None, progress_file=progress_file
+            )
+
+        lines = progress_file.read_text().splitlines()
+        assert [json.loads(line)["package_name"] for line in lines] == ["a"]
+
+
 class TestFindTypeCheckerCommand:
     """Tests for find_type_checker_command function."""
 
+    def setup_method(self) -> None:
+        """Clear the memoized lookups between tests."""
+        find_type_checker_command.cache_clear()
+
     def test_known_checker_available(self) -> None:
         """Test finding an available type checker."""
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0)
+        with patch("shutil.which") as mock_which:
+            mock_which.return_value = "/usr/bin/pyright-langserver"
 
             result = find_type_checker_command("pyright")
 
@@ -213,13 +403,23 @@ class TestFindTypeCheckerCommand:
 
     def test_known_checker_not_available(self) -> None:
         """Test when type checker is not installed."""
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=1)
+        with patch("shutil.which") as mock_which:
+            mock_which.return_value = None
 
             result = find_type_checker_command("pyright")
 
             assert result is None
 
+    def test_lookup_is_memoized(self) -> None:
+        """Test that repeated lookups do not rescan PATH."""
+        with patch("shutil.which") as mock_which:
+            mock_which.return_value = "/usr/bin/pyright-langserver"
+
+            find_type_checker_command("pyright")
+            find_type_checker_command("pyright")
+
+            mock_which.assert_called_once()
+
     def test_unknown_checker(self) -> None:
         """Test with unknown type checker name."""
         result = find_type_checker_command("unknown_checker")
@@ -227,6 +427,31 @@ class TestFindTypeCheckerCommand:
         assert result is None
 
 
+class TestRunCheckersTogether:
+    """Tests for _run_checkers_together function."""
+
+    def test_uses_in_memory_report(self, tmp_path: Path) -> None:
+        """Test that the typed benchmark entry point's report is parsed directly."""
+        report: dict[str, Any] = {
+            "summary": {
+                "pyrefly": {"ok": 3, "ok_pct": 100.0, "latency_ms": {"p50": 12.0}}
+            }
+        }
+        with patch(
+            "lsp.benchmark.daily_runner._lsp_benchmark.run", return_value=report
+        ) as mock_run:
+            results = _run_checkers_together(
+                [("pyrefly", "pyrefly lsp")], tmp_path, runs=3, seed=1
+            )
+
+        kwargs = mock_run.call_args.kwargs
+        assert kwargs["servers"] == [("pyrefly", "pyrefly lsp")]
+        assert kwargs["pyright_disable_indexing"] is False
+        assert results["pyrefly"]["ok"] is True
+        assert results["pyrefly"]["ok_count"] == 3
+        assert results["pyrefly"]["latency_ms"]["p50"] == 12.0
+
+
 class TestParseBenchmarkResults:
     """Tests for _parse_benchmark_results function."""
 
@@ -638,3 +863,16 @@ class TestSaveResultsOsName:
             latest_data = json.load(f)
 
         assert dated_data == latest_data
+
+    def test_save_replaces_stale_latest_file(self, tmp_path: Path) -> None:
+        """Test that an existing latest file is replaced with the new results."""
+        results, aggregate, checkers, versions = self._make_sample_data()
+        (tmp_path / "latest.json").write_text('{"stale": true}')
+
+        output_file = _save_results(
+            results, aggregate, checkers, versions,
+            package_count=1, runs_per_package=5,
+            output_dir=tmp_path,
+        )
+
+        assert (tmp_path / "latest.json").read_text() == output_file.read_text()
@@ -1,12 +1,27 @@
-from main import main, analyze_package
+from main import (
+    main,
+    analyze_package,
+    load_and_sort_top_packages,
+    _analyze_in_worker,
+    _init_analysis_worker,
+    parallel_analyze_packages,
+    separate_test_files,
+)
+import concurrent.futures
+import functools
+import multiprocessing
 import pytest
 from unittest.mock import Mock
 from io import BytesIO
+import json
 import tarfile
 import tempfile
+import threading
+import time
 import os
 import sys
 import requests.exceptions
+from pathlib import Path
 from typing import Any, Optional
 
 # Add the directory containing main.py to sys.path
@@ -66,7 +81,7 @@ def mock_get(url: str, *args: Any, **kwargs: Any) -> Any:
 
 
 def test_main_with_write_json_and_write_html(monkeypatch: pytest.MonkeyPatch) -> None:
-    def mock_load_and_sort_top_packages(json_file: str) -> list[dict[str, Any]]:
+    def mock_load_and_sort_top_packages(json_file: str, top_n: Optional[int] = None) -> list[dict[str, Any]]:
         return [
             {"download_count": 1000, "project": "package_a"},
             {"download_count": 500, "project": "package_b"},
@@ -98,7 +113,7 @@ def test_main_with_write_json_and_write_html(monkeypatch: pytest.MonkeyPatch) ->
 
 
 def test_main_without_write_json_and_write_html(monkeypatch: pytest.MonkeyPatch) -> None:
-    def mock_load_and_sort_top_packages(json_file: str) -> list[dict[str, Any]]:
+    def mock_load_and_sort_top_packages(json_file: str, top_n: Optional[int] = None) -> list[dict[str, Any]]:
         return [
             {"download_count": 1000, "project": "package_a"},
             {"download_count": 500, "project": "package_b"},
@@ -266,3 +281,178 @@ def test_main_analyze_package_with_non_typeshed_stubs(monkeypatch: pytest.Monkey
         assert package_report["CoverageData"]["return_coverage_with_tests"] == 50.0
         assert package_report["CoverageData"]["skipped_files"] == 1
         mock_generate_report.assert_called_once()
+
+
+def test_parallel_analyze_packages_keeps_rank_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    def mock_analyze_package_concurrently(
+        package_data: dict[str, Any],
+        rank: int,
+        typeshed_data: dict[str, dict[str, Any]],
+        packages_with_stubs: frozenset[str],
+    ) -> tuple[str, dict[str, Any]] | None:
+        # Finish lower-ranked packages first so completion order is reversed
+        time.sleep(0.01 * (4 - rank))
+        if not package_data["project"]:
+            return None
+        return package_data["project"], {"DownloadRanking": rank}
+
+    monkeypatch.setattr("main.analyze_package_concurrently",
+                        mock_analyze_package_concurrently)
+    # Run the workers as threads so the patched function is used
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor",
+                        concurrent.futures.ThreadPoolExecutor)
+
+    top_packages = [
+        {"download_count": 1000, "project": "package_a"},
+        {"download_count": 500, "project": ""},
+        {"download_count": 100, "project": "package_c"},
+    ]
+
+    package_report = parallel_analyze_packages(top_packages, {}, frozenset())
+
+    assert list(package_report) == ["package_a", "package_c"]
+    assert package_report["package_c"] == {"DownloadRanking": 3}
+
+
+def test_parallel_analyze_packages_bounds_in_flight(monkeypatch: pytest.MonkeyPatch) -> None:
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def mock_analyze_package_concurrently(
+        package_data: dict[str, Any],
+        rank: int,
+        typeshed_data: dict[str, dict[str, Any]],
+        packages_with_stubs: frozenset[str],
+    ) -> tuple[str, dict[str, Any]] | None:
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.005)
+        with lock:
+            in_flight -= 1
+        return package_data["project"], {"DownloadRanking": rank}
+
+    monkeypatch.setattr("main.analyze_package_concurrently",
+                        mock_analyze_package_concurrently)
+    monkeypatch.setattr("main.MAX_PARALLEL_ANALYSES", 2)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor",
+                        concurrent.futures.ThreadPoolExecutor)
+
+    top_packages = [
+        {"download_count": 100 - i, "project": f"package_{i}"} for i in range(6)
+    ]
+
+    package_report = parallel_analyze_packages(top_packages, {}, frozenset())
+
+    assert list(package_report) == [f"package_{i}" for i in range(6)]
+    assert peak <= 2
+
+
+def stub_analyze_package(
+    package_name: str,
+    rank: Optional[int] = None,
+    download_count: Optional[int] = None,
+    typeshed_data: Optional[dict[str, Any]] = None,
+    has_stub_package: bool = False,
+    parallel: bool = False,
+) -> dict[str, Any]:
+    # Module-level so worker processes can run it and pickle its result
+    return {
+        "DownloadRanking": rank,
+        "DownloadCount": download_count,
+        "HasStubsPackage": has_stub_package,
+        "TypeshedPackages": sorted(typeshed_data or {}),
+        "Parallel": parallel,
+        "WorkerPid": os.getpid(),
+    }
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                    reason="worker processes inherit the stub through fork")
+def test_parallel_analyze_packages_in_worker_processes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("main.analyze_package", stub_analyze_package)
+    # Real worker processes; fork so they see the patched analyze_package
+    monkeypatch.setattr(
+        concurrent.futures, "ProcessPoolExecutor",
+        functools.partial(concurrent.futures.ProcessPoolExecutor,
+                          mp_context=multiprocessing.get_context("fork")))
+
+    top_packages = [
+        {"download_count": 1000, "project": "package_a"},
+        {"download_count": 500, "project": ""},
+        {"download_count": 100, "project": "package_c"},
+    ]
+    typeshed_data = {"package_a": {"typeshed_coverage": 85.0}}
+
+    package_report = parallel_analyze_packages(
+        top_packages, typeshed_data, frozenset({"package_c"}))
+
+    assert list(package_report) == ["package_a", "package_c"]
+    assert package_report["package_a"]["DownloadRanking"] == 1
+    assert package_report["package_a"]["DownloadCount"] == 1000
+    assert package_report["package_a"]["HasStubsPackage"] is False
+    assert package_report["package_c"]["HasStubsPackage"] is True
+    assert package_report["package_c"]["TypeshedPackages"] == ["package_a"]
+    assert package_report["package_c"]["Parallel"] is True
+    assert package_report["package_a"]["WorkerPid"] != os.getpid()
+
+
+def test_separate_test_files() -> None:
+    files = [
+        "pkg/module.py",
+        "pkg/tests/test_module.py",
+        "pkg/_test/helpers.py",
+        "pkg/sub/test_/x.py",
+        "test/conftest.py",
+        "pkg/testing/utils.py",
+        "pkg/test_module.py",
+        "pkg/contest/x.py",
+    ]
+
+    assert separate_test_files(files) == [
+        "pkg/module.py",
+        "pkg/testing/utils.py",
+        "pkg/test_module.py",
+        "pkg/contest/x.py",
+    ]
+
+
+def test_load_and_sort_top_packages_top_n(tmp_path: Path) -> None:
+    json_file = tmp_path / "top.json"
+    rows = [
+        {"download_count": 5, "project": "e"},
+        {"download_count": 50, "project": "b"},
+        {"download_count": 10, "project": "d"},
+        {"download_count": 50, "project": "c"},
+        {"download_count": 100, "project": "a"},
+    ]
+    json_file.write_text(json.dumps({"rows": rows}))
+
+    full = load_and_sort_top_packages(str(json_file))
+    top = load_and_sort_top_packages(str(json_file), top_n=3)
+
+    assert [r["project"] for r in full] == ["a", "b", "c", "d", "e"]
+    assert top == full[:3]
+
+
+def test_analyze_in_worker_uses_initialized_inputs(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[tuple[Any, ...]] = []
+
+    def mock_analyze_package_concurrently(*args: Any) -> tuple[str, dict[str, Any]]:
+        calls.append(args)
+        return "package_a", {}
+
+    monkeypatch.setattr("main.analyze_package_concurrently",
+                        mock_analyze_package_concurrently)
+    monkeypatch.setattr("main._worker_typeshed_data", {})
+    monkeypatch.setattr("main._worker_packages_with_stubs", frozenset())
+
+    typeshed_data = {"package_a": {"typeshed_coverage": 85.0}}
+    _init_analysis_worker(typeshed_data, frozenset({"package_a"}))
+    _analyze_in_worker({"project": "package_a", "download_count": 1}, 1)
+
+    assert calls == [
+        ({"project": "package_a", "download_count": 1}, 1, typeshed_data, {"package_a"})
+    ]